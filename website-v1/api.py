@@ -0,0 +1,93 @@
+import base64
+import hashlib
+from bisect import bisect_right
+from dataclasses import asdict
+
+from flask import jsonify, make_response, request
+from flask.json.provider import DefaultJSONProvider
+
+from compression import negotiate
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder gives the same output, slower
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    # jsonify() through orjson when it is installed. Dates and dataclasses still go
+    # through Flask's default() so the output doesn't depend on which encoder ran.
+    options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson is not None else 0
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=self.options) + b'\n',
+                                        mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = JSONProvider(app)
+
+
+def encode_cursor(item_id):
+    return base64.urlsafe_b64encode(item_id.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    # binascii.Error and UnicodeDecodeError are ValueErrors, as is base64's own
+    # complaint about non-ASCII input
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    except ValueError:
+        return None
+
+
+def paginate(items, matches, positions, cursor, limit):
+    # `matches` are positions in `items`, ascending; the cursor is the id of the last
+    # item on the previous page, so pages stay put when unrelated items are edited.
+    # Returns (page, next cursor), or None for a cursor naming an item that's gone.
+    start = 0
+    if cursor:
+        position = positions.get(decode_cursor(cursor))
+        if position is None:
+            return None
+        start = bisect_right(matches, position)
+    page = [items[position] for position in matches[start:start + limit]]
+    more = start + limit < len(matches)
+    return page, encode_cursor(page[-1].id) if more and page else None
+
+
+def facets_json(facets):
+    return {name: [{'value': value, 'label': label, 'count': count} for value, label, count in facet]
+            if isinstance(facet, tuple) else facet
+            for name, facet in facets.items()}
+
+
+def item_json(item, url):
+    data = asdict(item)
+    data['url'] = url
+    return data
+
+
+def conditional_json(etag_parts, build):
+    # The ETag comes from the content version and the query, so a revalidation is
+    # answered before anything is filtered or serialized. `build()` returns the payload
+    # dict, or any other view return value (an error) to send as is.
+    etag = hashlib.sha1(repr(etag_parts).encode('utf-8')).hexdigest()
+    # compress_response tags compressed bodies with their encoding
+    encoding = negotiate()
+    for tag in (etag, f'{etag}-{encoding}') if encoding else (etag,):
+        if request.if_none_match.contains(tag):
+            response = make_response('', 304)
+            response.set_etag(tag)
+            response.vary.add('Accept-Encoding')
+            return response
+    rv = build()
+    if not isinstance(rv, dict):
+        return rv
+    response = jsonify(rv)
+    response.set_etag(etag)
+    return response
@@ -1,475 +1,415 @@
-from flask import Flask, render_template, request, flash, redirect, url_for
-from datetime import datetime
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-
-# Company Configuration
-SITE_CONFIG = {
-    'company_name': 'A-frame Solutions',
-    'tagline': 'Salesforce Development & Strategic Consulting',
-    'email': 'contact@aframesolutions.com',
-    'phone': '+1 (555) 123-4567',
-    'linkedin': 'https://linkedin.com/company/aframe-solutions',
-    
-    # Salesforce-specific credentials
-    'certifications': [
-        'Salesforce Certified Platform Developer II',
-        'Salesforce Certified Application Architect',
-        'Salesforce Certified System Architect',
-        'Salesforce Certified Technical Architect (CTA) Candidate'
-    ],
-    'partner_status': 'Salesforce Consulting Partner',
-    'years_experience': '12+',
-    'projects_completed': '200+',
-    'industries_served': ['Healthcare', 'Financial Services', 'Manufacturing', 'Technology', 'Nonprofit']
+import hashlib
+import json
+import os
+import click
+import api
+import assets
+import benchmark
+import compression
+import fragment_cache
+import freeze
+import limits
+import metrics
+import server
+import tenants
+import warmup
+from api import conditional_json, facets_json, item_json, paginate
+from content import SqliteSource, current_content, industry_value, open_source
+from dotenv import dotenv_values
+from leads import LeadDispatcher, LeadQueue
+from flask import Flask, current_app, request, flash, redirect, url_for, jsonify
+from flask.cli import with_appcontext
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime, timezone
+from page_cache import cached_page, last_modified, templates_version
+from related import normalize_tech
+from tenants import render_template
+
+DEFAULT_SECRET_KEY = 'your-secret-key-change-in-production'
+# Keys anyone can read in this repo; `flask serve` refuses to run with them
+PLACEHOLDER_SECRET_KEYS = (DEFAULT_SECRET_KEY, 'your-secret-key-here-change-in-production')
+
+# Cache-Control per endpoint; case studies and services change rarely
+CACHE_CONTROL = {
+    'home': 'public, max-age=300',
+    'services': 'public, max-age=3600',
+    'service_detail': 'public, max-age=86400, stale-while-revalidate=604800',
+    'projects': 'public, max-age=3600',
+    'project_detail': 'public, max-age=86400, stale-while-revalidate=604800',
+    'about': 'public, max-age=3600',
+    'search': 'public, max-age=300',
+    'api_search': 'public, max-age=300',
+    'api_projects': 'public, max-age=300',
+    'api_services': 'public, max-age=300',
+    'contact': 'no-store',
+    'metrics': 'no-store',
 }
 
-# Salesforce Services
-SERVICES = [
-    {
-        'id': 'apex-development',
-        'title': 'Custom Apex Development',
-        'icon': '⚡',
-        'short_description': 'Enterprise-grade Apex code that scales with your business.',
-        'full_description': '''We build robust, scalable Apex solutions following Salesforce best practices and design patterns. 
-        Our code is always bulkified, properly tested (90%+ coverage), and optimized for performance. We specialize in complex 
-        business logic, integrations, and custom platform extensions.''',
-        'deliverables': [
-            'Custom Apex classes, triggers, and batch jobs',
-            'Comprehensive test coverage (90%+ code coverage)',
-            'Governor limit optimization and performance tuning',
-            'Integration with external systems via REST/SOAP',
-            'Detailed technical documentation',
-            'Post-deployment support and monitoring'
-        ],
-        'ideal_for': 'Organizations needing complex automation, custom business logic, or Salesforce platform extensions',
-        'outcomes': [
-            'Automated workflows that save 20+ hours per week',
-            'Scalable code that handles high data volumes',
-            'Maintainable solutions with clear documentation',
-            'Faster time-to-market for new features'
-        ],
-        'tech_highlights': ['Apex', 'SOQL/SOSL', 'Queueable', 'Batch Apex', 'Platform Events']
-    },
-    {
-        'id': 'lightning-web-components',
-        'title': 'Lightning Web Components (LWC)',
-        'icon': '🎨',
-        'short_description': 'Modern, responsive interfaces that delight users.',
-        'full_description': '''We create beautiful, performant Lightning Web Components using modern JavaScript (ES6+) 
-        and Salesforce Lightning Design System. Our components are reusable, accessible (WCAG 2.1 AA), and optimized for 
-        both desktop and mobile experiences.''',
-        'deliverables': [
-            'Custom Lightning Web Components',
-            'Lightning App Builder compatible components',
-            'Mobile-responsive designs',
-            'SLDS-compliant styling',
-            'Cross-browser testing',
-            'Component documentation and usage guides'
-        ],
-        'ideal_for': 'Companies wanting to modernize their Salesforce UI and improve user adoption',
-        'outcomes': [
-            ' 40% increase in user adoption',
-            'Faster page load times',
-            'Consistent, branded user experience',
-            'Reduced support tickets due to intuitive design'
-        ],
-        'tech_highlights': ['LWC', 'JavaScript', 'HTML/CSS', 'SLDS', 'Lightning Data Service']
-    },
-    {
-        'id': 'salesforce-consulting',
-        'title': 'Strategic Salesforce Consulting',
-        'icon': '🎯',
-        'short_description': 'Expert guidance to maximize your Salesforce investment.',
-        'full_description': '''We provide strategic consulting to help you get the most from Salesforce. From platform 
-        strategy and architecture reviews to implementation roadmaps and change management, we ensure your Salesforce 
-        org supports your business goals.''',
-        'deliverables': [
-            'Salesforce health check and org assessment',
-            'Technical architecture review',
-            'Implementation roadmap with priorities',
-            'Best practices documentation',
-            'Change management strategies',
-            'Executive-level reporting and recommendations'
-        ],
-        'ideal_for': 'Organizations planning major Salesforce initiatives or experiencing platform challenges',
-        'outcomes': [
-            'Clear roadmap for Salesforce growth',
-            'Reduced technical debt',
-            'Better alignment with business goals',
-            'Higher ROI from Salesforce investment'
-        ],
-        'tech_highlights': ['Platform Strategy', 'Solution Architecture', 'Best Practices', 'Governance']
-    },
-    {
-        'id': 'integration-services',
-        'title': 'Integration & Data Migration',
-        'icon': '🔗',
-        'short_description': 'Seamlessly connect Salesforce with your entire tech stack.',
-        'full_description': '''We design and implement robust integrations between Salesforce and your external systems. 
-        Whether it's ERP, marketing automation, or custom applications, we ensure data flows securely and reliably. 
-        We also handle complex data migrations with zero data loss.''',
-        'deliverables': [
-            'Integration architecture and design',
-            'Custom REST/SOAP API development',
-            'Middleware configuration (MuleSoft, Boomi, etc.)',
-            'Real-time and batch data sync solutions',
-            'Data migration with validation',
-            'Error handling and monitoring'
-        ],
-        'ideal_for': 'Companies with complex tech stacks needing Salesforce integration',
-        'outcomes': [
-            'Single source of truth across systems',
-            '99.9% data sync reliability',
-            'Real-time visibility into business operations',
-            'Eliminated manual data entry'
-        ],
-        'tech_highlights': ['REST API', 'SOAP', 'Platform Events', 'Change Data Capture', 'Data Loader']
-    },
-    {
-        'id': 'healthcare-solutions',
-        'title': 'Healthcare-Specific Solutions',
-        'icon': '🏥',
-        'short_description': 'HIPAA-compliant Salesforce solutions for healthcare organizations.',
-        'full_description': '''We specialize in building secure, HIPAA-compliant Salesforce solutions for healthcare 
-        providers, payers, and life sciences companies. We understand healthcare workflows, compliance requirements, 
-        and the unique challenges of the industry.''',
-        'deliverables': [
-            'Health Cloud implementation and customization',
-            'HIPAA compliance and security reviews',
-            'Patient engagement portals',
-            'Provider relationship management',
-            'Claims processing automation',
-            'Healthcare analytics and reporting'
-        ],
-        'ideal_for': 'Healthcare providers, insurance companies, and medical device manufacturers',
-        'outcomes': [
-            'HIPAA-compliant patient data management',
-            'Improved care coordination',
-            'Faster claims processing',
-            'Enhanced patient satisfaction scores'
-        ],
-        'tech_highlights': ['Health Cloud', 'Shield Platform Encryption', 'Audit Trail', 'Person Accounts']
-    },
-    {
-        'id': 'financial-services',
-        'title': 'Financial Services Solutions',
-        'icon': '💰',
-        'short_description': 'Secure Salesforce implementations for financial institutions.',
-        'full_description': '''We build secure, compliant Salesforce solutions for banks, wealth management firms, 
-        insurance companies, and fintech startups. We understand regulatory requirements, security best practices, 
-        and the complex needs of financial services organizations.''',
-        'deliverables': [
-            'Financial Services Cloud implementation',
-            'Wealth management solutions',
-            'Loan origination systems',
-            'Compliance and audit trail setup',
-            'Client onboarding automation',
-            'Financial analytics dashboards'
-        ],
-        'ideal_for': 'Banks, wealth advisors, insurance companies, and fintech companies',
-        'outcomes': [
-            'Regulatory compliance (SOX, FINRA, etc.)',
-            'Faster client onboarding (50% reduction)',
-            '360-degree client view',
-            'Improved advisor productivity'
-        ],
-        'tech_highlights': ['Financial Services Cloud', 'Shield', 'Einstein Analytics', 'Actionable Relationships']
-    }
-]
-
-# Case Studies / Projects
-PROJECTS = [
-    {
-        'id': 'ephi-audit-system',
-        'title': 'ePHI Audit & Compliance Platform',
-        'client': 'National Behavioral Health Network',
-        'tagline': 'Metadata-driven Salesforce audit layer covering every PHI touchpoint across five critical objects.',
-        'image_placeholder': '🩺',
-        'problem': 'Compliance and security teams lacked field-level visibility into how clinicians and coordinators were touching protected health information. Manual audits across Account, Contact, Assessment, Order, and Program Engagement objects took days and still left blind spots around record views.',
-        'solution': 'Architected a modular audit platform with Apex triggers, Lightning Web Components, and metadata-driven configuration. Triggers capture create/update/delete events per field, while an invisible LWC logs view/close activity in real time. Custom metadata toggles tracked objects and fields without deployments, and BaseDML services guarantee partial-success inserts.',
-        'tech_stack': ['Salesforce Platform', 'Apex', 'Lightning Web Components', 'Custom Metadata Types', 'Field Sets', 'Platform Events'],
-        'results': [
-            '100% Create/View/Edit/Delete coverage across Account, Contact, Assessment, Order, and Program Engagement',
-            'Per-field audit records generated automatically for every change, ready for HIPAA reporting in minutes',
-            'View/close tracking closes blind spots and proves who accessed sensitive records',
-            'Admins adjust tracked fields through metadata with no additional code releases',
-        ],
-        'featured': True,
-    },
-    {
-        'id': 'hipaa-suspicious-login',
-        'title': 'HIPAA Suspicious Login Detection',
-        'client': 'Regional Healthcare System',
-        'tagline': 'Proactive Salesforce security pipeline that flags risky logins within 15 minutes and routes investigators.',
-        'image_placeholder': '🔐',
-        'problem': 'Security leadership needed continuous insight into suspicious login behavior but was stuck exporting LoginHistory weekly and triaging alerts manually. Investigations were slow, inconsistent, and difficult to audit.',
-        'solution': 'Delivered a schedulable + queueable orchestration that sweeps LoginHistory every 15 minutes, evaluates risk via configurable metadata, and writes prioritized alerts to Suspicious_Login__c. Lightning dashboards and reviewer utilities give investigators one queue for triage, while platform events and permission sets enforce least privilege.',
-        'tech_stack': ['Salesforce', 'Apex', 'Platform Events', 'Queueables', 'Lightning Web Components', 'Custom Metadata Types'],
-        'results': [
-            'Continuous monitoring with a 15-minute rolling detection window covering 100% of logins',
-            'Automated investigator queue with deduplicated alerts and merged violation reasons',
-            'Configurable thresholds, whitelists, and schedules managed entirely by admins',
-            'Investigation time reduced by 60% thanks to richer context and prioritized routing',
-        ],
-        'featured': True,
-    },
-    {
-        'id': 'healthcare-patient-portal',
-        'title': 'Patient Engagement Portal',
-        'client': 'Regional Healthcare System',
-        'industry': 'Healthcare',
-        'tagline': 'Increased patient satisfaction by 45% with HIPAA-compliant self-service portal',
-        'image_placeholder': '🏥',
-        'problem': '''A 12-hospital healthcare system struggled with patient engagement and faced high call 
-        center volumes for appointment scheduling and medical records requests. Patients had no self-service 
-        options, leading to frustration and decreased satisfaction scores.''',
-        'solution': '''We built a custom Lightning Experience portal on Salesforce Experience Cloud with 
-        Health Cloud integration. Patients can schedule appointments, view lab results, message providers, 
-        and access medical records securely. All data is encrypted and HIPAA-compliant with full audit trails.''',
-        'tech_stack': ['Health Cloud', 'Experience Cloud', 'LWC', 'Shield Platform Encryption', 'DocuSign Integration'],
-        'results': [
-            '45% increase in patient satisfaction scores',
-            '60% reduction in call center volume for routine requests',
-            '10,000+ patients registered in first 3 months',
-            'HIPAA audit passed with zero findings'
-        ],
-        'featured': True,
-        'duration': '4 months',
-        'team_size': '3 developers + 1 architect'
-    },
-    {
-        'id': 'wealth-management-crm',
-        'title': 'Wealth Management CRM',
-        'client': 'Private Wealth Advisors',
-        'industry': 'Financial Services',
-        'tagline': 'Transformed client management for $5B AUM firm with 360° advisor view',
-        'image_placeholder': '💼',
-        'problem': '''A wealth management firm managing $5B in assets operated with disparate systems for 
-        client data, portfolio management, and communications. Advisors wasted hours switching between systems, 
-        and compliance tracking was manual and error-prone.''',
-        'solution': '''We implemented Financial Services Cloud with custom Apex integrations to portfolio 
-        management systems. Built custom LWC components for household relationship management, automated 
-        compliance workflows, and Einstein Analytics dashboards for advisor productivity tracking.''',
-        'tech_stack': ['Financial Services Cloud', 'Apex', 'LWC', 'Einstein Analytics', 'Heroku Connect'],
-        'results': [
-            '360° view of client households and relationships',
-            '3 hours saved per advisor per day',
-            '100% compliance tracking automation',
-            '25% increase in assets under management'
-        ],
-        'featured': True,
-        'duration': '6 months',
-        'team_size': '4 developers + 1 architect + 1 business analyst'
-    },
-    {
-        'id': 'manufacturing-cpq',
-        'title': 'Custom CPQ Solution',
-        'client': 'Industrial Equipment Manufacturer',
-        'industry': 'Manufacturing',
-        'tagline': 'Reduced quote generation time from 5 days to 30 minutes',
-        'image_placeholder': '⚙️',
-        'problem': '''A complex industrial equipment manufacturer with highly configurable products took 
-        5+ days to generate quotes. Their sales team struggled with pricing rules, and errors in quotes 
-        led to margin erosion and delayed deals.''',
-        'solution': '''Built a custom CPQ solution using Apex and LWC with advanced pricing rules, 
-        configuration logic, and integration with their ERP system. Implemented guided selling to help 
-        reps configure products correctly, and automated approval workflows.''',
-        'tech_stack': ['Apex', 'LWC', 'Flows', 'SAP Integration', 'DocuSign CLM'],
-        'results': [
-            'Quote generation reduced from 5 days to 30 minutes',
-            '95% reduction in pricing errors',
-            '40% increase in quote-to-close rate',
-            '$2M recovered margin in first year'
-        ],
-        'featured': True,
-        'duration': '5 months',
-        'team_size': '5 developers + 1 architect'
-    },
-    {
-        'id': 'nonprofit-fundraising',
-        'title': 'Donor Management System',
-        'client': 'National Education Nonprofit',
-        'industry': 'Nonprofit',
-        'tagline': 'Increased fundraising efficiency by 60% with Nonprofit Cloud',
-        'image_placeholder': '🎓',
-        'problem': '''A national education nonprofit tracked donations in spreadsheets and couldn't segment 
-        donors effectively. They missed fundraising opportunities and struggled to show impact to major donors.''',
-        'solution': '''Implemented Nonprofit Success Pack (NPSP) with custom campaign management, automated 
-        thank-you workflows, and Einstein Analytics for donor insights. Built donor portal for donation history 
-        and impact tracking.''',
-        'tech_stack': ['Nonprofit Cloud (NPSP)', 'Marketing Cloud', 'Experience Cloud', 'Einstein Analytics'],
-        'results': [
-            '60% increase in fundraising team efficiency',
-            '35% growth in recurring donations',
-            'Major donor retention improved from 70% to 92%',
-            'Automated thank-you process saved 200+ hours/year'
-        ],
-        'featured': False,
-        'duration': '3 months',
-        'team_size': '2 developers + 1 consultant'
-    },
-    {
-        'id': 'saas-integration-platform',
-        'title': 'Multi-SaaS Integration Hub',
-        'client': 'Enterprise SaaS Company',
-        'industry': 'Technology',
-        'tagline': 'Connected 15 SaaS tools to Salesforce with zero downtime',
-        'image_placeholder': '🔗',
-        'problem': '''A fast-growing SaaS company used 15+ different tools (Zendesk, Stripe, HubSpot, etc.) 
-        with no integration. Sales and support teams operated blind without customer data visibility across tools.''',
-        'solution': '''Architected an integration hub using Platform Events, Change Data Capture, and custom 
-        REST APIs. Built middleware on Heroku for complex transformations. Implemented real-time sync for 
-        critical data and batch processing for historical data.''',
-        'tech_stack': ['Platform Events', 'Change Data Capture', 'REST APIs', 'Heroku', 'Redis'],
-        'results': [
-            'Real-time sync of customer data across 15 tools',
-            '99.9% sync reliability (measured over 6 months)',
-            'Support team resolution time reduced 40%',
-            'Sales team visibility into customer health scores'
-        ],
-        'featured': False,
-        'duration': '4 months',
-        'team_size': '3 developers + 1 integration architect'
-    }
-]
-
-# Client Testimonials
-TESTIMONIALS = [
-    {
-        'quote': '''A-frame Solutions transformed our patient engagement strategy. Their deep understanding 
-        of both Salesforce and healthcare compliance gave us confidence throughout the project. The portal 
-        they built has become indispensable to our operations.''',
-        'author': 'Dr. Sarah Mitchell',
-        'title': 'Chief Medical Information Officer',
-        'company': 'Regional Healthcare System',
-        'rating': 5
-    },
-    {
-        'quote': '''Working with A-frame was a game-changer for our firm. They didn't just implement 
-        Financial Services Cloud—they understood our business model and built a solution that our advisors 
-        actually love using. ROI was evident within the first quarter.''',
-        'author': 'James Patterson',
-        'title': 'Managing Partner',
-        'company': 'Private Wealth Advisors',
-        'rating': 5
-    },
-    {
-        'quote': '''The CPQ solution A-frame built has fundamentally changed how we sell. What used to take 
-        our sales team days now takes minutes, and the accuracy is perfect. The team's Apex development 
-        skills are world-class.''',
-        'author': 'Michael Chen',
-        'title': 'VP of Sales',
-        'company': 'Industrial Equipment Manufacturer',
-        'rating': 5
-    },
-    {
-        'quote': '''As a technical team, we're very particular about code quality. A-frame's developers 
-        exceeded our standards—clean code, excellent documentation, and they taught us best practices 
-        along the way. True Salesforce experts.''',
-        'author': 'Lisa Rodriguez',
-        'title': 'CTO',
-        'company': 'Enterprise SaaS Company',
-        'rating': 5
-    }
-]
-
-# Stats for trust indicators
-STATS = [
-    {'number': '200+', 'label': 'Projects Delivered'},
-    {'number': '98%', 'label': 'Client Satisfaction'},
-    {'number': '12+', 'label': 'Years Experience'},
-    {'number': '$50M+', 'label': 'ROI Generated for Clients'}
-]
-
-# Routes
-@app.route('/')
+def create_app(config=None):
+    """Build the site. `config` overrides anything read from the environment."""
+    app = Flask(__name__)
+    # Real environment variables win over .env, which is re-read on every call
+    # so a graceful reload (SIGHUP to `flask serve`) picks up edits to it
+    env = {**dotenv_values(os.path.join(app.root_path, '.env')), **os.environ}
+
+    app.config['SECRET_KEY'] = env.get('SECRET_KEY', DEFAULT_SECRET_KEY)
+    # Rendered pages and {% cache %} fragments, per tenant; off for `flask freeze` and `flask bench --cold`
+    app.config['PAGE_CACHE'] = True
+    app.config['PAGE_CACHE_SIZE'] = 256
+    app.config['PAGE_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+    app.config['FRAGMENT_CACHE_MAX_BYTES'] = 4 * 1024 * 1024
+    app.config['CACHE_CONTROL'] = CACHE_CONTROL
+
+    # Site content lives in data/ (JSON/YAML files) or a SQLite database and is
+    # reloaded automatically when it changes; see content.py
+    app.config['CONTENT_PATH'] = env.get('CONTENT_PATH', os.path.join(app.root_path, 'data'))
+    app.config['CONTENT_CHECK_INTERVAL'] = 2.0
+    # Case studies per page on /projects; None lists them all (the static export does)
+    app.config['PROJECTS_PER_PAGE'] = 12
+    # Other brands served from this process by Host header; see tenants.py
+    app.config['TENANTS_PATH'] = env.get('TENANTS_PATH')
+
+    # Abuse protection per client IP, shared by all `flask serve` workers; see limits.py.
+    # Behind nginx or a load balancer, set TRUSTED_PROXIES to the number of proxy hops
+    # so the client's address comes from X-Forwarded-For.
+    app.config['RATE_LIMIT'] = True
+    app.config['RATE_LIMITS'] = {'contact': (5, 300)}   # contact form posts: 5 per 5 minutes
+    app.config['RENDER_RATE_LIMIT'] = (60, 10)          # pages not served from the page cache
+    app.config['MAX_CONCURRENT_RENDERS'] = 4            # per worker; more waits, then gets a 503
+    app.config['TRUSTED_PROXIES'] = int(env.get('TRUSTED_PROXIES', 0))
+
+    # Contact-form leads: a durable local queue drained to SMTP in the background.
+    # For local testing run a debugging SMTP server, e.g. `python -m aiosmtpd -n -l localhost:1025`
+    app.config['LEADS_DATABASE'] = env.get('LEADS_DATABASE', os.path.join(app.instance_path, 'leads.db'))
+    app.config['LEADS_RECIPIENT'] = env.get('LEADS_RECIPIENT')
+    app.config['LEADS_WORKERS'] = 2
+    app.config['LEADS_BATCH_SIZE'] = 20
+    app.config['LEADS_MAX_ATTEMPTS'] = 8
+    # Off for processes that render but never serve, like `flask freeze` workers
+    app.config['LEADS_DISPATCH'] = True
+    app.config['MAIL_SERVER'] = env.get('MAIL_SERVER', 'localhost')
+    app.config['MAIL_PORT'] = int(env.get('MAIL_PORT', 1025))
+    app.config['MAIL_USE_TLS'] = env.get('MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes')
+    app.config['MAIL_USERNAME'] = env.get('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = env.get('MAIL_PASSWORD')
+    app.config['MAIL_SENDER'] = env.get('MAIL_SENDER')
+
+    # Compiled templates are kept across restarts; `flask warmup` fills the cache at deploy time
+    app.config['JINJA_CACHE_DIR'] = env.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja-cache'))
+
+    # Server-Timing on every response and Prometheus metrics at /metrics. `flask serve`
+    # points METRICS_DIR at a scratch directory so every worker's numbers are aggregated.
+    app.config['METRICS_DIR'] = env.get('METRICS_DIR')
+
+    app.config.update(config or {})
+
+    app.extensions['lead_queue'] = LeadQueue(app.config['LEADS_DATABASE'])
+    app.extensions['lead_dispatcher'] = LeadDispatcher(
+        app.extensions['lead_queue'], app.config,
+        workers=app.config['LEADS_WORKERS'],
+        batch_size=app.config['LEADS_BATCH_SIZE'],
+        max_attempts=app.config['LEADS_MAX_ATTEMPTS'])
+
+    # Template bytecode cache and `flask warmup`; first, before any template is compiled
+    warmup.init_app(app)
+
+    # {% cache %} blocks for the layout chrome in base.html (nav, footer, head and scripts)
+    fragment_cache.init_app(app, tenants.current_fragment_cache)
+
+    # Compiled, content-hashed stylesheets (`flask assets build`) and the asset_url() helper
+    assets.init_app(app)
+
+    # gzip/brotli negotiation; cached pages and built assets keep their compressed variants
+    compression.init_app(app)
+
+    # jsonify() through orjson when it's installed
+    api.init_app(app)
+
+    # Render caches are invalidated whenever the content, a template or a built asset changes
+    app.config['TEMPLATES_VERSION'] = templates_version(app, app.extensions['assets'])
+    app.config['TEMPLATES_LAST_MODIFIED'] = last_modified(*(
+        os.path.join(app.root_path, app.template_folder, name) for name in app.jinja_env.list_templates()))
+
+    # The default site plus any TENANTS_PATH brands, each with its own content and caches
+    tenants.init_app(app)
+
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.before_request(start_lead_dispatcher)
+    app.after_request(apply_cache_control)
+    app.context_processor(inject_now)
+
+    freeze.init_app(app, freeze_url_args, exclude=('search', 'api_search', 'api_projects', 'api_services', 'metrics'))
+
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                                x_proto=app.config['TRUSTED_PROXIES'])
+
+    metrics.init_app(app, metrics_gauges)
+    app.extensions['metrics'].collectors.append(lambda: [
+        (name, (('tenant', tenant.name),), value)
+        for tenant in app.extensions['tenants']
+        for name, value in (('page_cache_hits_total', tenant.page_cache.hits),
+                            ('page_cache_misses_total', tenant.page_cache.misses),
+                            ('fragment_cache_hits_total', tenant.fragment_cache.hits),
+                            ('fragment_cache_misses_total', tenant.fragment_cache.misses))
+    ])
+
+    # Token buckets for contact posts and uncached renders, and a cap on renders in flight;
+    # after metrics so rejected requests are still counted
+    limits.init_app(app)
+
+    # `flask bench`: per-route latency, throughput and memory, with baseline comparison
+    benchmark.init_app(app)
+
+    # `flask serve`: prefork production server with graceful reload on SIGHUP
+    server.init_app(app, create_app, placeholder_secret_keys=PLACEHOLDER_SECRET_KEYS)
+
+    app.cli.add_command(export_content)
+    app.cli.add_command(leads_stats)
+    return app
+
+# (rule, view, options), registered on each app by create_app()
+ROUTES = []
+
+def route(rule, **options):
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+@route('/')
+@cached_page
 def home():
-    featured_projects = [p for p in PROJECTS if p.get('featured', False)]
+    content = current_content()
     return render_template('home.html', 
-                         config=SITE_CONFIG, 
-                         services=SERVICES[:4],  # Show first 4 services
-                         projects=featured_projects,
-                         testimonials=TESTIMONIALS[:3],
-                         stats=STATS)
+                         config=content.site_config, 
+                         services=content.services[:4],  # Show first 4 services
+                         projects=content.featured_projects,
+                         testimonials=content.testimonials[:3],
+                         stats=content.stats)
 
-@app.route('/services')
+@route('/services')
+@cached_page
 def services():
+    content = current_content()
     return render_template('services.html', 
-                         config=SITE_CONFIG, 
-                         services=SERVICES)
+                         config=content.site_config, 
+                         services=content.services)
 
-@app.route('/services/<service_id>')
+@route('/services/<service_id>')
+@cached_page
 def service_detail(service_id):
-    service = next((s for s in SERVICES if s['id'] == service_id), None)
+    content = current_content()
+    service = content.service(service_id)
     if not service:
         return redirect(url_for('services'))
     
-    # Get related case studies
-    related_projects = [p for p in PROJECTS if any(
-        tech in service['tech_highlights'] for tech in p.get('tech_stack', [])
-    )][:3]
-    
     return render_template('service_detail.html', 
-                         config=SITE_CONFIG, 
+                         config=content.site_config, 
                          service=service,
-                         related_projects=related_projects)
+                         related_projects=content.related_projects_for_service(service_id))
 
-@app.route('/projects')
+# Query arguments /projects reads; the page cache keys on exactly these
+PROJECT_FILTERS = ('industry', 'tech', 'featured', 'cursor')
+
+@route('/projects')
+@cached_page(query_args=PROJECT_FILTERS)
 def projects():
+    content = current_content()
+    industry = request.args.get('industry', '')
+    techs = request.args.getlist('tech')
+    featured = request.args.get('featured')
+    # Only facet values reach the page cache, so made-up filters can't flood it
+    if ((industry and industry not in content.projects_by_industry)
+            or any(tech not in content.projects_by_tech for tech in techs)
+            or len(set(techs)) != len(techs) or featured not in (None, '1')):
+        return redirect(url_for('projects'))
+
+    matches = content.filter_projects(industry, techs, featured == '1')
+    per_page = current_app.config['PROJECTS_PER_PAGE'] or len(content.projects)
+    page = paginate(content.projects, matches, content.project_positions, request.args.get('cursor'), per_page)
+    if page is None:
+        return redirect(url_for('projects', industry=industry or None, tech=techs, featured=featured))
+    page_projects, next_cursor = page
     return render_template('projects.html', 
-                         config=SITE_CONFIG, 
-                         projects=PROJECTS,
-                         stats=STATS)
+                         config=content.site_config, 
+                         projects=page_projects,
+                         total=len(matches),
+                         facets=content.project_facets,
+                         industry=industry,
+                         techs=techs,
+                         featured=featured,
+                         next_cursor=next_cursor,
+                         stats=content.stats)
 
-@app.route('/projects/<project_id>')
+@route('/projects/<project_id>')
+@cached_page
 def project_detail(project_id):
-    project = next((p for p in PROJECTS if p['id'] == project_id), None)
+    content = current_content()
+    project = content.project(project_id)
     if not project:
         return redirect(url_for('projects'))
     
-    # Get related projects (same industry)
-    related_projects = [p for p in PROJECTS 
-                       if p['id'] != project_id and p.get('industry') == project.get('industry')][:2]
-    
     return render_template('project_detail.html', 
-                         config=SITE_CONFIG, 
+                         config=content.site_config, 
                          project=project,
-                         related_projects=related_projects)
+                         related_projects=content.related_projects_for_project(project_id))
 
-@app.route('/about')
+@route('/about')
+@cached_page
 def about():
     return render_template('about.html', 
-                         config=SITE_CONFIG)
+                         config=current_content().site_config)
+
+@route('/search')
+def search():
+    query = request.args.get('q', '').strip()[:200]
+    results = current_content().search_index.search(query, limit=20) if query else []
+    return render_template('search.html', 
+                         config=current_content().site_config,
+                         query=query,
+                         results=results)
+
+@route('/api/search')
+def api_search():
+    query = request.args.get('q', '').strip()[:200]
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    kind = request.args.get('kind') if request.args.get('kind') in ('service', 'project') else None
+    prefix = request.args.get('prefix', '1') != '0'
+    results = current_content().search_index.search(query, limit=limit, prefix=prefix, kind=kind)
+    return jsonify(query=query, results=[{
+        'kind': item_kind,
+        'id': item.id,
+        'title': item.title,
+        'summary': item.short_description if item_kind == 'service' else item.tagline,
+        'url': url_for('service_detail', service_id=item.id) if item_kind == 'service'
+               else url_for('project_detail', project_id=item.id),
+        'score': round(score, 4),
+    } for item_kind, item, score in results])
 
-@app.route('/contact', methods=['GET', 'POST'])
+@route('/api/projects')
+def api_projects():
+    content = current_content()
+    industry = request.args.get('industry', '').strip()
+    techs = request.args.getlist('tech')
+    featured = request.args.get('featured') == '1'
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    cursor = request.args.get('cursor')
+
+    def build():
+        matches = content.filter_projects(industry, techs, featured)
+        page = paginate(content.projects, matches, content.project_positions, cursor, limit)
+        if page is None:
+            return jsonify(error='Unknown cursor; start again from the first page'), 400
+        items, next_cursor = page
+        return {
+            'items': [item_json(project, url_for('project_detail', project_id=project.id)) for project in items],
+            'next_cursor': next_cursor,
+            'total': len(matches),
+            'facets': facets_json(content.project_facets),
+        }
+    return conditional_json((content.version, request.endpoint, industry_value(industry),
+                             sorted(normalize_tech(tech) for tech in techs), featured, limit, cursor), build)
+
+@route('/api/services')
+def api_services():
+    content = current_content()
+    techs = request.args.getlist('tech')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    cursor = request.args.get('cursor')
+
+    def build():
+        matches = content.filter_services(techs)
+        page = paginate(content.services, matches, content.service_positions, cursor, limit)
+        if page is None:
+            return jsonify(error='Unknown cursor; start again from the first page'), 400
+        items, next_cursor = page
+        return {
+            'items': [item_json(service, url_for('service_detail', service_id=service.id)) for service in items],
+            'next_cursor': next_cursor,
+            'total': len(matches),
+            'facets': facets_json(content.service_facets),
+        }
+    return conditional_json((content.version, request.endpoint,
+                             sorted(normalize_tech(tech) for tech in techs), limit, cursor), build)
+
+@route('/contact', methods=['GET', 'POST'])
 def contact():
     if request.method == 'POST':
-        name = request.form.get('name')
-        email = request.form.get('email')
-        company = request.form.get('company')
-        budget = request.form.get('budget')
-        message = request.form.get('message')
+        lead = {field: request.form.get(field, '') for field in ('name', 'email', 'company', 'budget', 'message')}
+        lead['to'] = current_app.config['LEADS_RECIPIENT'] or current_content().site_config.email
+        
+        # The form's submission_id, made in the browser so the page stays identical for
+        # everyone (and exportable), makes resubmits idempotent. Without script it's
+        # empty and the lead's own content is the key.
+        key = request.form.get('submission_id', '')[:64] or hashlib.sha1(
+            json.dumps(lead, sort_keys=True).encode('utf-8')).hexdigest()
         
-        # Here you would typically send an email or save to database
-        # For now, we'll just print to console and show a success message
-        print(f"New Contact Form Submission:")
-        print(f"Name: {name}")
-        print(f"Email: {email}")
-        print(f"Company: {company}")
-        print(f"Budget: {budget}")
-        print(f"Message: {message}")
+        # Queued durably here; the dispatcher threads handle SMTP off the request path
+        if current_app.extensions['lead_queue'].enqueue(key, lead):
+            current_app.extensions['lead_dispatcher'].notify()
         
         flash('Thank you for your message! We will respond within 24 hours.', 'success')
         return redirect(url_for('contact'))
     
     return render_template('contact.html', 
-                         config=SITE_CONFIG)
+                         config=current_content().site_config)
+
+def start_lead_dispatcher():
+    if current_app.config['LEADS_DISPATCH']:
+        current_app.extensions['lead_dispatcher'].ensure_started()
+
+def apply_cache_control(response):
+    # Only pages that rendered (or revalidated) get the endpoint's policy; flash redirects stay uncached
+    policy = current_app.config['CACHE_CONTROL'].get(request.endpoint)
+    if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+        policy = 'no-store'
+    if policy and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+    return response
 
-@app.context_processor
 def inject_now():
-    return {'now': datetime.now()}
+    # UTC, like the page cache's day boundary
+    return {'now': datetime.now(timezone.utc)}
+
+# Routes with arguments, for the static export (`flask freeze`)
+def freeze_url_args():
+    content = current_content()
+    for service in content.services:
+        yield 'service_detail', {'service_id': service.id}
+    for project in content.projects:
+        yield 'project_detail', {'project_id': project.id}
+
+def metrics_gauges():
+    leads = current_app.extensions['lead_queue'].stats()
+    yield 'leads_queue_depth', (), leads['depth']
+    yield 'leads_failed', (), leads['failed']
+    yield 'leads_oldest_pending_seconds', (), leads['oldest_age_seconds']
+    for tenant in current_app.extensions['tenants']:
+        labels = (('tenant', tenant.name),)
+        yield 'content_info', labels + (('version', tenant.store.current().version),), 1
+        yield 'page_cache_bytes', labels, tenant.page_cache.size
+        yield 'fragment_cache_bytes', labels, tenant.fragment_cache.size
+
+@click.command('export-content')
+@click.argument('database')
+@with_appcontext
+def export_content(database):
+    """Copy the current content into a SQLite database."""
+    SqliteSource.write(database, open_source(current_app.config['CONTENT_PATH']).load()[0])
+    click.echo(f'Wrote {database}; set CONTENT_PATH={database} to serve from it')
+
+@click.command('leads')
+@with_appcontext
+def leads_stats():
+    """Show contact-form queue depth and delivery counts."""
+    for name, value in current_app.extensions['lead_queue'].stats().items():
+        click.echo(f'{name}: {value:g}' if isinstance(value, float) else f'{name}: {value}')
+
+# For `flask --app app ...`, the static export and WSGI servers that import `app:app`
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development only: one process with the debugger. Use `flask --app app serve` in production.
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import mimetypes
+import os
+import shlex
+import subprocess
+import tempfile
+
+import click
+from flask import request, send_from_directory, url_for
+
+from compression import brotli, compress, negotiate
+
+MANIFEST = 'dist/manifest.json'
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Stylesheets compiled from assets/ by the Tailwind CLI: logical name -> source
+STYLESHEETS = {'css/site.css': 'assets/site.css'}
+
+
+def init_app(app):
+    app.config.setdefault('TAILWIND_CLI', os.environ.get('TAILWIND_CLI', 'npx tailwindcss'))
+    app.extensions['assets'] = load_manifest(app)
+
+    @app.template_global()
+    def asset_url(name):
+        # None until `flask assets build` has run, so base.html can fall back to the CDN
+        path = app.extensions['assets'].get(name)
+        return url_for('static', filename=path) if path else None
+
+    @app.before_request
+    def precompressed_assets():
+        # Built assets have .br/.gz siblings written once at build time
+        if request.endpoint != 'static' or not request.view_args['filename'].startswith('dist/'):
+            return None
+        encoding = negotiate()
+        filename = request.view_args['filename']
+        if encoding is None or not os.path.exists(os.path.join(app.static_folder, filename + SUFFIXES[encoding])):
+            return None
+        response = send_from_directory(app.static_folder, filename + SUFFIXES[encoding],
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def immutable_assets(response):
+        # Hashed filenames never change content, so browsers can keep them forever;
+        # a miss may be a file that's about to be built, so it mustn't stick
+        if (request.endpoint == 'static' and request.view_args['filename'].startswith('dist/')
+                and response.status_code in (200, 304)):
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    @app.cli.group('assets')
+    def assets_group():
+        """Build static assets."""
+
+    @assets_group.command('build')
+    def build_command():
+        """Compile and purge the Tailwind stylesheet into static/dist/."""
+        for name, path in build(app).items():
+            click.echo(f'{name} -> {path}')
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def build(app):
+    dist = os.path.join(app.static_folder, 'dist')
+    os.makedirs(dist, exist_ok=True)
+    manifest = load_manifest(app)
+    for name, source in STYLESHEETS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'out.css')
+            # tailwind.config.js scans templates/ so only classes in use are emitted
+            subprocess.run(shlex.split(app.config['TAILWIND_CLI']) + [
+                '--config', os.path.join(app.root_path, 'tailwind.config.js'),
+                '--input', os.path.join(app.root_path, source),
+                '--output', output,
+                '--minify',
+            ], check=True, cwd=app.root_path)
+            with open(output, 'rb') as f:
+                css = f.read()
+        stem, ext = os.path.splitext(os.path.basename(name))
+        filename = f'{stem}.{hashlib.sha256(css).hexdigest()[:12]}{ext}'
+        with open(os.path.join(dist, filename), 'wb') as f:
+            f.write(css)
+        for encoding, suffix in SUFFIXES.items():
+            if encoding != 'br' or brotli is not None:
+                with open(os.path.join(dist, filename + suffix), 'wb') as f:
+                    f.write(compress(css, encoding, best=True))
+        manifest[name] = f'dist/{filename}'
+
+    with open(os.path.join(app.static_folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    app.extensions['assets'] = manifest
+    return manifest
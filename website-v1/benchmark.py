@@ -0,0 +1,296 @@
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import click
+from werkzeug.serving import make_server
+
+from freeze import page_urls
+
+# Dynamic routes the static export skips, benchmarked with a representative query
+EXTRA_URLS = ('/search?q=health', '/api/search?q=data&limit=10',
+              '/api/projects?tech=apex&limit=10', '/api/services')
+
+# Run in a fresh interpreter: cold-start cost of a new worker
+STARTUP_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/').close()
+first = time.perf_counter()
+app.app.test_client().get('/').close()
+second = time.perf_counter()
+import warmup
+stats = warmup.warm(app.create_app())
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (first - imported) * 1000,
+    'second_request_ms': (second - first) * 1000,
+    'warmup_compile_ms': stats['compile_ms'],
+    'warmup_render_ms': stats['render_ms'],
+}))
+'''
+
+# Sub-millisecond routes jitter by more than any sensible ratio, so a latency
+# regression must also exceed this many milliseconds to count
+NOISE_FLOOR_MS = 0.25
+STARTUP_NOISE_FLOOR_MS = 5.0
+
+
+def init_app(app):
+    @app.cli.command('bench')
+    @click.option('--requests', '-n', default=200, show_default=True, help='Test-client requests per URL.')
+    @click.option('--concurrency', '-c', default='1,8,32', show_default=True,
+                  help='Comma-separated client counts for the HTTP server runs.')
+    @click.option('--duration', '-d', default=5.0, show_default=True, help='Seconds per concurrency level.')
+    @click.option('--no-server', is_flag=True, help='Only run the in-process test-client pass.')
+    @click.option('--cold', is_flag=True, help='Disable the page cache so every request renders.')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write results as JSON.')
+    @click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+                  help='Earlier --output file to compare against; exits 1 on regression.')
+    @click.option('--threshold', default=0.2, show_default=True,
+                  help='Allowed slowdown against the baseline (0.2 = 20%).')
+    def bench_command(requests, concurrency, duration, no_server, cold, output, baseline, threshold):
+        """Benchmark every route for latency, throughput and memory."""
+        # Every request comes from one address; the per-client limits would throttle the run
+        app.config['RATE_LIMIT'] = False
+        if cold:
+            app.config['PAGE_CACHE'] = False
+        urls = page_urls(app) + list(EXTRA_URLS)
+        results = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'page_cache': not cold,
+            'startup': run_startup(app),
+            'routes': run_client(app, urls, requests),
+            'client_peak_rss_kib': _rss_kib(),
+            'server': {} if no_server else {
+                str(clients): run_server(app, urls, clients, duration)
+                for clients in map(int, concurrency.split(','))
+            },
+        }
+        report(results)
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            click.echo(f'Wrote {output}')
+        if baseline:
+            with open(baseline) as f:
+                regressions = compare(json.load(f), results, threshold)
+            for line in regressions:
+                click.echo(f'REGRESSION {line}', err=True)
+            if regressions:
+                sys.exit(1)
+            click.echo(f'No regressions beyond {threshold:.0%} of {baseline}')
+
+
+def percentiles(samples):
+    # Nearest-rank p50/p95/p99 in milliseconds
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'mean': sum(ordered) / len(ordered) * 1000}
+
+
+def endpoint_for(app, url):
+    path, _, query = url.partition('?')
+    return app.url_map.bind('localhost').match(path, query_args=query)[0]
+
+
+def _rss_kib():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_startup(app):
+    # Import, first request and warm-up in a new process, first with an empty template
+    # bytecode cache and then with the one that run filled
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, JINJA_CACHE_DIR=cache_dir)
+        return {
+            label: json.loads(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, cwd=app.root_path,
+                                             check=True, capture_output=True, text=True).stdout)
+            for label in ('empty_bytecode_cache', 'bytecode_cache')
+        }
+
+
+def run_client(app, urls, requests):
+    # Latency through the test client (no sockets), then a separate tracemalloc
+    # pass so tracing overhead doesn't skew the timings
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'br, gzip'}
+    timings = defaultdict(list)
+    allocations = defaultdict(list)
+    statuses = {}
+
+    for url in urls:
+        statuses[endpoint_for(app, url)] = client.get(url, headers=headers).status_code  # warm up
+    for _ in range(requests):
+        for url in urls:
+            start = time.perf_counter()
+            client.get(url, headers=headers).close()
+            timings[endpoint_for(app, url)].append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for _ in range(min(requests, 20)):
+        for url in urls:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            client.get(url, headers=headers).close()
+            allocations[endpoint_for(app, url)].append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        endpoint: dict(percentiles(samples),
+                       requests=len(samples),
+                       status=statuses[endpoint],
+                       alloc_peak_kib=sum(allocations[endpoint]) / len(allocations[endpoint]) / 1024)
+        for endpoint, samples in sorted(timings.items())
+    }
+
+
+def _serve(server, connection):
+    # Runs in the forked server process; reports its peak RSS when told to stop
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    connection.send('ready')
+    try:
+        server.serve_forever()
+    finally:
+        connection.send(_rss_kib())
+
+
+def run_server(app, urls, clients, duration):
+    # A real threaded WSGI server in a forked process, driven by `clients`
+    # concurrent HTTP clients for `duration` seconds
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    context = multiprocessing.get_context('fork')
+    parent, child = context.Pipe()
+    process = context.Process(target=_serve, args=(server, child), daemon=True)
+    process.start()
+    server.socket.close()
+    parent.recv()
+
+    endpoints = [endpoint_for(app, url) for url in urls]
+    timings = defaultdict(list)
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+        local = defaultdict(list)
+        i = offset
+        while time.perf_counter() < deadline:
+            url, endpoint = urls[i % len(urls)], endpoints[i % len(urls)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', url, headers={'Accept-Encoding': 'br, gzip'})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(f'{url}: {e}')
+                connection.close()
+                continue
+            # A fast 429, 503 or 500 isn't throughput
+            if response.status >= 400:
+                errors.append(f'{url}: {response.status} {response.reason}')
+                continue
+            local[endpoint].append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            for endpoint, samples in local.items():
+                timings[endpoint].extend(samples)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    process.terminate()
+    peak_rss = parent.recv() if parent.poll(5) else None
+    process.join()
+
+    everything = [sample for samples in timings.values() for sample in samples]
+    return {
+        'clients': clients,
+        'requests': len(everything),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'requests_per_second': len(everything) / elapsed,
+        'latency': percentiles(everything) if everything else None,
+        'routes': {endpoint: percentiles(samples) for endpoint, samples in sorted(timings.items())},
+        'server_peak_rss_kib': peak_rss,
+    }
+
+
+def compare(baseline, current, threshold):
+    # Per-route p95 and per-concurrency throughput against an earlier run
+    regressions = []
+    for endpoint, stats in current['routes'].items():
+        if stats['status'] >= 400:
+            regressions.append(f"{endpoint}: status {stats['status']}")
+        before = baseline['routes'].get(endpoint)
+        if before is None:
+            continue
+        if stats['p95'] > before['p95'] * (1 + threshold) and stats['p95'] - before['p95'] > NOISE_FLOOR_MS:
+            regressions.append(f"{endpoint}: p95 {before['p95']:.2f}ms -> {stats['p95']:.2f}ms")
+        if stats['alloc_peak_kib'] > before['alloc_peak_kib'] * (1 + threshold):
+            regressions.append(f"{endpoint}: allocations {before['alloc_peak_kib']:.0f}KiB -> "
+                               f"{stats['alloc_peak_kib']:.0f}KiB")
+    for name, value in current['startup']['bytecode_cache'].items():
+        before = baseline.get('startup', {}).get('bytecode_cache', {}).get(name)
+        if before and value > before * (1 + threshold) and value - before > STARTUP_NOISE_FLOOR_MS:
+            regressions.append(f'startup {name}: {before:.0f}ms -> {value:.0f}ms')
+    for clients, run in current['server'].items():
+        # Failures make any throughput number meaningless
+        if run['errors']:
+            regressions.append(f"{clients} clients: {run['errors']} failed requests, e.g. {run['error_samples'][0]}")
+        before = baseline['server'].get(clients)
+        if before and run['requests_per_second'] < before['requests_per_second'] * (1 - threshold):
+            regressions.append(f"{clients} clients: {before['requests_per_second']:.0f} req/s -> "
+                               f"{run['requests_per_second']:.0f} req/s")
+    return regressions
+
+
+def report(results):
+    for label, startup in results['startup'].items():
+        click.echo(f"startup ({label.replace('_', ' ')}): import {startup['import_ms']:.0f}ms, "
+                   f"first request {startup['first_request_ms']:.1f}ms, "
+                   f"second {startup['second_request_ms']:.1f}ms, "
+                   f"warm-up {startup['warmup_compile_ms'] + startup['warmup_render_ms']:.0f}ms")
+    click.echo(f"{'endpoint':<18} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'alloc KiB':>10}")
+    for endpoint, stats in results['routes'].items():
+        click.echo(f"{endpoint:<18} {stats['status']:>6} {stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+                   f"{stats['p99']:>8.2f} {stats['alloc_peak_kib']:>10.1f}")
+    click.echo(f"test client peak RSS: {results['client_peak_rss_kib'] / 1024:.1f} MiB")
+    for clients, run in results['server'].items():
+        latency = run['latency'] or {'p50': 0, 'p95': 0, 'p99': 0}
+        rss = f"{run['server_peak_rss_kib'] / 1024:.1f} MiB" if run['server_peak_rss_kib'] else 'n/a'
+        click.echo(f"{clients:>3} clients: {run['requests_per_second']:8.0f} req/s  "
+                   f"p50 {latency['p50']:.2f}ms  p95 {latency['p95']:.2f}ms  p99 {latency['p99']:.2f}ms  "
+                   f"errors {run['errors']}  server RSS {rss}")
+        for sample in run.get('error_samples', ()):
+            click.echo(f'      {sample}')
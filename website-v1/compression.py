@@ -0,0 +1,59 @@
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.after_request(compress_response)
+
+
+def negotiate():
+    # Preferred encoding the client accepts: br, then gzip, else None (identity)
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, best=False):
+    # `best` is for bodies compressed ahead of time (built assets, the static export);
+    # anything compressed while a request waits uses the fast levels
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def should_compress(response):
+    return (response.status_code == 200
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and (response.mimetype or '').startswith(COMPRESSIBLE)
+            and (response.content_length or 0) >= current_app.config['COMPRESS_MIN_SIZE'])
+
+
+def compress_response(response):
+    # Fallback for responses that aren't cached (e.g. the contact page); cached
+    # pages and built assets already carry a stored variant
+    if response.status_code == 200 and (response.mimetype or '').startswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    if not should_compress(response):
+        return response
+    encoding = negotiate()
+    if encoding is None:
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    if response.get_etag()[0]:
+        etag, weak = response.get_etag()
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
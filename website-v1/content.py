@@ -0,0 +1,343 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from related import RelatedIndex, normalize_tech
+from search import SearchIndex
+
+try:
+    import yaml
+except ImportError:  # YAML content files are optional
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Anything a half-written or malformed source can raise while loading; a reload that
+# fails with one of these keeps the last good version
+LOAD_ERRORS = (OSError, ValueError, TypeError, KeyError, AttributeError, RuntimeError, sqlite3.Error) + (
+    (yaml.YAMLError,) if yaml is not None else ())
+
+DOCUMENTS = ('site', 'services', 'projects', 'testimonials', 'stats')
+
+
+# Content records are frozen and slotted: small, hashable, and never written to
+# after load, so pages stay shared between forked workers.
+@dataclass(frozen=True, slots=True)
+class SiteConfig:
+    company_name: str
+    tagline: str
+    email: str
+    phone: str
+    linkedin: str
+    certifications: tuple
+    partner_status: str
+    years_experience: str
+    projects_completed: str
+    industries_served: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Service:
+    id: str
+    title: str
+    icon: str
+    short_description: str
+    full_description: str
+    deliverables: tuple
+    ideal_for: str
+    outcomes: tuple
+    tech_highlights: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Project:
+    id: str
+    title: str
+    client: str
+    tagline: str
+    image_placeholder: str
+    problem: str
+    solution: str
+    tech_stack: tuple
+    results: tuple
+    featured: bool = False
+    industry: str = ''
+    duration: str = ''
+    team_size: str = ''
+
+
+@dataclass(frozen=True, slots=True)
+class Testimonial:
+    quote: str
+    author: str
+    title: str
+    company: str
+    rating: int
+
+
+@dataclass(frozen=True, slots=True)
+class Stat:
+    number: str
+    label: str
+
+
+def _record(cls, data, source):
+    if not isinstance(data, dict):
+        raise ValueError(f'{source}: expected a mapping, got {type(data).__name__}')
+    known = {field.name for field in fields(cls)}
+    unknown = data.keys() - known
+    if unknown:
+        raise ValueError(f'{source}: unknown {cls.__name__} field(s) {", ".join(sorted(unknown))}')
+    try:
+        return cls(**{key: tuple(value) if isinstance(value, list) else value for key, value in data.items()})
+    except TypeError as e:
+        raise ValueError(f'{source}: {e}') from None
+
+
+class ContentRepository:
+    # Indexes over the site content, built once so routes never scan the lists
+    def __init__(self, documents, version, last_modified, previous=None,
+                 related_per_service=3, related_per_project=2):
+        self.version = version
+        self.last_modified = last_modified
+        for name in DOCUMENTS:
+            # An empty YAML file loads as None; a stray top-level mapping isn't a list either
+            if name != 'site' and not isinstance(documents[name], list):
+                raise ValueError(f'{name}: expected a list, got {type(documents[name]).__name__}')
+        self.site_config = _record(SiteConfig, documents['site'], 'site')
+        self.services = tuple(_record(Service, item, 'services') for item in documents['services'])
+        self.projects = tuple(_record(Project, item, 'projects') for item in documents['projects'])
+        self.testimonials = tuple(_record(Testimonial, item, 'testimonials') for item in documents['testimonials'])
+        self.stats = tuple(_record(Stat, item, 'stats') for item in documents['stats'])
+
+        self.services_by_id = {service.id: service for service in self.services}
+        self.projects_by_id = {project.id: project for project in self.projects}
+        self.featured_projects = tuple(project for project in self.projects if project.featured)
+
+        self.project_positions = {project.id: position for position, project in enumerate(self.projects)}
+        self.service_positions = {service.id: position for position, service in enumerate(self.services)}
+
+        # Inverted indexes for filtering, keyed by facet value; posting lists keep PROJECTS
+        # (or SERVICES) order. Frozen to plain dicts of tuples so lookups never add keys.
+        labels = {}
+        self.projects_by_industry = _postings(
+            ((position, project.industry) for position, project in enumerate(self.projects) if project.industry),
+            industry_value, labels)
+        self.projects_by_tech = _postings(
+            ((position, tech) for position, project in enumerate(self.projects) for tech in project.tech_stack),
+            normalize_tech, labels)
+        self.services_by_tech = _postings(
+            ((position, tech) for position, service in enumerate(self.services) for tech in service.tech_highlights),
+            normalize_tech, labels)
+        self.featured_positions = tuple(position for position, project in enumerate(self.projects) if project.featured)
+
+        # Facet counts over the whole catalog: (value, label, count), most common first
+        self.project_facets = {
+            'industry': _facet(self.projects_by_industry, labels),
+            'tech': _facet(self.projects_by_tech, labels),
+            'featured': len(self.featured_positions),
+        }
+        self.service_facets = {'tech': _facet(self.services_by_tech, labels)}
+
+        # Similarity-ranked neighbours; only items that changed since the previous version are re-scored
+        self.related_index = RelatedIndex.build(self, previous.related_index if previous else None,
+                                                k=max(related_per_service, related_per_project))
+        self.related_for_service = {
+            service.id: tuple(self.projects_by_id[project_id] for project_id, _ in
+                              self.related_index.related('service', service.id, related_per_service))
+            for service in self.services
+        }
+        self.related_for_project = {
+            project.id: tuple(self.projects_by_id[project_id] for project_id, _ in
+                              self.related_index.related('project', project.id, related_per_project))
+            for project in self.projects
+        }
+
+        # Only items that changed since the previous version are re-tokenized
+        self.search_index = SearchIndex.build(self, previous.search_index if previous else None)
+
+    def service(self, service_id):
+        return self.services_by_id.get(service_id)
+
+    def project(self, project_id):
+        return self.projects_by_id.get(project_id)
+
+    def related_projects_for_service(self, service_id):
+        return self.related_for_service.get(service_id, ())
+
+    def related_projects_for_project(self, project_id):
+        return self.related_for_project.get(project_id, ())
+
+    def filter_projects(self, industry=None, techs=(), featured=False):
+        # Positions of the matching case studies, in PROJECTS order
+        postings = []
+        if industry:
+            postings.append(self.projects_by_industry.get(industry_value(industry), ()))
+        postings.extend(self.projects_by_tech.get(normalize_tech(tech), ()) for tech in techs)
+        if featured:
+            postings.append(self.featured_positions)
+        return _intersect(postings, len(self.projects))
+
+    def filter_services(self, techs=()):
+        return _intersect([self.services_by_tech.get(normalize_tech(tech), ()) for tech in techs],
+                          len(self.services))
+
+
+def industry_value(name):
+    return name.strip().lower()
+
+
+def _postings(pairs, normalize, labels):
+    index = defaultdict(list)
+    for position, name in pairs:
+        value = normalize(name)
+        labels.setdefault(value, name.strip())  # the first spelling seen is the one shown
+        posting = index[value]
+        if not posting or posting[-1] != position:
+            posting.append(position)
+    return {value: tuple(posting) for value, posting in index.items()}
+
+
+def _facet(index, labels):
+    return tuple(sorted(((value, labels[value], len(posting)) for value, posting in index.items()),
+                        key=lambda facet: (-facet[2], facet[1].lower())))
+
+
+def _intersect(postings, count):
+    # Start from the shortest posting list; no filters matches everything
+    if not postings:
+        return range(count)
+    postings = sorted(postings, key=len)
+    matches = set(postings[0])
+    for posting in postings[1:]:
+        matches.intersection_update(posting)
+    return sorted(matches)
+
+
+class DirectorySource:
+    # One file per document: data/site.json, data/services.yaml, ...
+    def __init__(self, path):
+        self.path = path
+
+    def _files(self):
+        files = {}
+        for name in DOCUMENTS:
+            for ext in ('.json', '.yaml', '.yml'):
+                candidate = os.path.join(self.path, name + ext)
+                if os.path.exists(candidate):
+                    files[name] = candidate
+                    break
+            else:
+                raise FileNotFoundError(f'No content file for {name!r} in {self.path}')
+        return files
+
+    def fingerprint(self):
+        return tuple(os.stat(path).st_mtime_ns for path in self._files().values())
+
+    def load(self):
+        documents, digest, mtime = {}, hashlib.sha1(), 0
+        for name, path in self._files().items():
+            with open(path, 'rb') as f:
+                raw = f.read()
+            digest.update(raw)
+            mtime = max(mtime, os.path.getmtime(path))
+            if path.endswith('.json'):
+                documents[name] = json.loads(raw)
+            elif yaml is None:
+                raise RuntimeError(f'{path} needs PyYAML (pip install PyYAML)')
+            else:
+                documents[name] = yaml.safe_load(raw)
+        return documents, digest.hexdigest()[:16], datetime.fromtimestamp(int(mtime), timezone.utc)
+
+
+class SqliteSource:
+    # A `documents(name, body)` table of JSON bodies; writers commit in one transaction
+    def __init__(self, path):
+        self.path = path
+
+    def fingerprint(self):
+        # The WAL file changes on commit before the checkpoint touches the main file
+        return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+                     for path in (self.path, self.path + '-wal'))
+
+    def load(self):
+        with closing(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)) as db:
+            rows = dict(db.execute('SELECT name, body FROM documents'))
+        missing = set(DOCUMENTS) - rows.keys()
+        if missing:
+            raise ValueError(f'{self.path}: missing document(s) {", ".join(sorted(missing))}')
+        digest = hashlib.sha1()
+        for name in DOCUMENTS:
+            digest.update(rows[name].encode('utf-8'))
+        mtime = max(os.path.getmtime(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+        documents = {name: json.loads(rows[name]) for name in DOCUMENTS}
+        return documents, digest.hexdigest()[:16], datetime.fromtimestamp(int(mtime), timezone.utc)
+
+    @staticmethod
+    def write(path, documents):
+        with closing(sqlite3.connect(path)) as db, db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, body TEXT NOT NULL)')
+            db.executemany('INSERT OR REPLACE INTO documents (name, body) VALUES (?, ?)',
+                           [(name, json.dumps(documents[name], ensure_ascii=False)) for name in DOCUMENTS])
+
+
+def open_source(path):
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteSource(path)
+    return DirectorySource(path)
+
+
+class ContentStore:
+    # Holds the current ContentRepository and swaps in a new one when the source changes
+    def __init__(self, path, check_interval=2.0):
+        self.source = open_source(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._fingerprint = self.source.fingerprint()
+        self._failed = None     # fingerprint of files that last failed to load
+        self._repository = ContentRepository(*self.source.load())
+        self._checked = time.monotonic()
+
+    def current(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            self._maybe_reload()
+        return self._repository
+
+    def _maybe_reload(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking; serve the current content
+        try:
+            self._checked = time.monotonic()
+            fingerprint = None
+            try:
+                fingerprint = self.source.fingerprint()
+                # Files that failed to load are retried only once they change again
+                if fingerprint in (self._fingerprint, self._failed):
+                    return
+                repository = ContentRepository(*self.source.load(), previous=self._repository)
+            except LOAD_ERRORS as e:
+                # Usually an editor mid-save; keep serving the last good content
+                logger.warning('Content reload failed, keeping version %s: %s', self._repository.version, e)
+                self._failed = fingerprint
+                return
+            self._fingerprint = fingerprint
+            self._repository = repository
+            logger.info('Loaded content version %s', repository.version)
+        finally:
+            self._lock.release()
+
+
+def current_content():
+    # Each tenant has its own store; outside a request this is the default site
+    return current_app.extensions['tenants'].current().store.current()
@@ -0,0 +1,99 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    # LRU of rendered template fragments, bounded by the memory their strings use
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= sys.getsizeof(previous)
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+
+    def sync_version(self, version):
+        # Fragments rendered from older content or templates can never be hit again
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self._entries.clear()
+                    self.size = 0
+                    self.version = version
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'nav', request.endpoint %}...{% endcache %}``
+
+    Renders the body once per key and reuses the output. Key parts must be
+    hashable and cover everything the body depends on besides the content and
+    template versions, which the cache tracks itself. Keep anything per-visitor
+    (flashed messages, form tokens) outside cached blocks.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        # Returns (cache, version) for the render in progress; no cache renders every time
+        environment.extend(fragment_cache=lambda: (None, None))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        # The block's position keeps equal keys in different blocks apart
+        parts[:0] = [nodes.Const(parser.name), nodes.Const(lineno)]
+        return nodes.CallBlock(self.call_method('_render', [nodes.Tuple(parts, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache, version = self.environment.fragment_cache()
+        if cache is None:
+            return caller()
+        cache.sync_version(version)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            cache.set(key, fragment)
+        return fragment
+
+
+def init_app(app, resolve):
+    # `resolve()` returns the FragmentCache for the current request and the content and
+    # templates version its fragments are rendered from
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = resolve
@@ -0,0 +1,166 @@
+import hashlib
+import importlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+
+import click
+from flask import before_render_template, url_for
+from jinja2 import meta
+
+from assets import SUFFIXES
+from compression import brotli, compress
+
+MANIFEST = '.freeze-manifest.json'
+
+# Per-process state for export workers
+_worker = {}
+
+
+class _Unchanged(Exception):
+    pass
+
+
+def init_app(app, url_args, exclude=()):
+    # url_args() yields (endpoint, view_args) for routes that take arguments;
+    # `exclude` names endpoints that only make sense dynamically
+    app.extensions['freeze'] = (url_args, frozenset(exclude))
+
+    @app.cli.command('freeze')
+    @click.argument('output', default='build', type=click.Path(file_okay=False))
+    @click.option('--jobs', '-j', default=os.cpu_count(), show_default=True, help='Render processes.')
+    @click.option('--force', is_flag=True, help='Re-render every page.')
+    def freeze_command(output, jobs, force):
+        """Export every page as static HTML for nginx."""
+        stats = freeze(app, output, jobs=jobs, force=force)
+        click.echo('{rendered} rendered, {unchanged} unchanged, {removed} removed -> {output}'.format(
+            output=output, **stats))
+
+
+def page_urls(app, base_url=None):
+    # `base_url` picks the tenant whose pages are listed; the default site otherwise
+    url_args, exclude = app.extensions['freeze']
+    urls = []
+    with app.test_request_context(base_url=base_url):
+        for rule in app.url_map.iter_rules():
+            if (rule.endpoint not in exclude and rule.endpoint != 'static'
+                    and 'GET' in rule.methods and not rule.arguments):
+                urls.append(url_for(rule.endpoint))
+        for endpoint, view_args in url_args():
+            urls.append(url_for(endpoint, **view_args))
+    return urls
+
+
+def output_path(output, url):
+    return os.path.join(output, url.strip('/'), 'index.html')
+
+
+def freeze(app, output, jobs=None, force=False):
+    manifest_path = os.path.join(output, MANIFEST)
+    manifest = {}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    urls = page_urls(app)
+    stats = {'rendered': 0, 'unchanged': 0, 'removed': 0}
+    new_manifest = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(app.import_name, output)) as pool:
+        previous = [manifest.get(url) for url in urls]
+        for url, (digest, rendered) in zip(urls, pool.map(_export_page, urls, previous)):
+            new_manifest[url] = digest
+            stats['rendered' if rendered else 'unchanged'] += 1
+
+    # Pages whose content was removed since the last export
+    for url in manifest.keys() - new_manifest.keys():
+        path = output_path(output, url)
+        if os.path.exists(path):
+            for stale in (path, *(path + suffix for suffix in SUFFIXES.values())):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            stats['removed'] += 1
+
+    # Compiled CSS and other static files ship alongside the pages
+    if app.static_folder and os.path.isdir(app.static_folder):
+        shutil.copytree(app.static_folder, os.path.join(output, app.static_url_path.strip('/')),
+                        dirs_exist_ok=True)
+
+    os.makedirs(output, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(new_manifest, f, indent=2, sort_keys=True)
+    return stats
+
+
+def _init_worker(import_name, output):
+    _worker['app'] = importlib.import_module(import_name).app
+    # Every page must reach render_template so its inputs can be hashed
+    _worker['app'].config['PAGE_CACHE'] = False
+    _worker['app'].config['LEADS_DISPATCH'] = False
+    _worker['app'].config['RATE_LIMIT'] = False
+    # A static page can't filter or paginate, so /projects lists every case study
+    _worker['app'].config['PROJECTS_PER_PAGE'] = None
+    _worker['output'] = output
+    _worker['templates'] = {}
+    before_render_template.connect(_check_inputs, _worker['app'])
+
+
+def _export_page(url, previous):
+    app = _worker['app']
+    path = output_path(_worker['output'], url)
+    _worker['previous'] = previous if os.path.exists(path) else None
+    with app.test_request_context(url):
+        try:
+            response = app.full_dispatch_request()
+        except _Unchanged:
+            return previous, False
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} returned {response.status}')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = response.get_data()
+    with open(path, 'wb') as f:
+        f.write(body)
+    # Precompressed siblings for nginx gzip_static/brotli_static
+    for encoding, suffix in SUFFIXES.items():
+        if encoding != 'br' or brotli is not None:
+            with open(path + suffix, 'wb') as f:
+                f.write(compress(body, encoding, best=True))
+    return _worker['digest'], True
+
+
+def _check_inputs(sender, template, context, **extra):
+    # A page's inputs are its template chain, the built asset URLs asset_url() hands
+    # out, and the data passed to render_template
+    digest = hashlib.sha1()
+    digest.update(_template_digest(sender.jinja_env, template.name).encode('utf-8'))
+    digest.update(json.dumps(sender.extensions['assets'], sort_keys=True).encode('utf-8'))
+    data = {key: value for key, value in context.items() if key not in ('request', 'session', 'g')}
+    digest.update(json.dumps(data, sort_keys=True, default=_json_default).encode('utf-8'))
+    _worker['digest'] = digest.hexdigest()
+    if _worker['digest'] == _worker['previous']:
+        raise _Unchanged
+
+
+def _json_default(value):
+    # `now` only matters at day granularity, like the page cache
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if is_dataclass(value):
+        return asdict(value)
+    return str(value)
+
+
+def _template_digest(env, name):
+    # Hash of a template and everything it extends, includes or imports
+    cache = _worker['templates']
+    if name not in cache:
+        source = env.loader.get_source(env, name)[0]
+        digest = hashlib.sha1(source.encode('utf-8'))
+        for dependency in sorted(filter(None, meta.find_referenced_templates(env.parse(source)))):
+            digest.update(_template_digest(env, dependency).encode('utf-8'))
+        cache[name] = digest.hexdigest()
+    return cache[name]
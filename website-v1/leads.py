@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS leads_due ON leads (status, next_attempt_at);
+'''
+
+
+class LeadQueue:
+    # Durable queue of contact-form submissions in a SQLite WAL database.
+    # Shared by every worker process; each thread keeps its own connection.
+    def __init__(self, path, lease=60.0):
+        self.path = path
+        self.lease = lease
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def enqueue(self, key, payload):
+        # Returns False when the idempotency key was already queued (a double-submit)
+        now = time.time()
+        cursor = self._db().execute(
+            'INSERT OR IGNORE INTO leads (key, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(payload), now, now))
+        return cursor.rowcount == 1
+
+    def claim(self, limit, lease=None):
+        # Leases due rows to the caller; a crashed sender's lease simply expires.
+        # The lease must outlast the caller's work on the whole batch, or another
+        # sender re-claims rows that are still being sent.
+        lease = self.lease if lease is None else lease
+        db = self._db()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                "SELECT id, payload, attempts FROM leads "
+                "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?", (now, limit)).fetchall()
+            db.executemany("UPDATE leads SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                           [(now + lease, row[0]) for row in rows])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return [(lead_id, json.loads(payload), attempts) for lead_id, payload, attempts in rows]
+
+    def mark_sent(self, lead_id):
+        self._db().execute("UPDATE leads SET status = 'sent', last_error = NULL WHERE id = ?", (lead_id,))
+
+    def mark_retry(self, lead_id, error, delay):
+        self._db().execute(
+            "UPDATE leads SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+            "WHERE id = ?", (time.time() + delay, error, lead_id))
+
+    def mark_failed(self, lead_id, error):
+        self._db().execute(
+            "UPDATE leads SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+            (error, lead_id))
+
+    def stats(self):
+        counts = dict(self._db().execute('SELECT status, COUNT(*) FROM leads GROUP BY status'))
+        oldest = self._db().execute(
+            "SELECT MIN(created_at) FROM leads WHERE status IN ('pending', 'sending')").fetchone()[0]
+        return {
+            'depth': counts.get('pending', 0) + counts.get('sending', 0),
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_age_seconds': time.time() - oldest if oldest else 0.0,
+        }
+
+
+class LeadDispatcher:
+    # Background threads that drain the queue in batches over one SMTP connection each
+    def __init__(self, queue, mail_config, workers=2, batch_size=20, max_attempts=8,
+                 backoff=5.0, max_backoff=3600.0, poll_interval=1.0, timeout=30.0):
+        self.queue = queue
+        self.mail_config = mail_config
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        # Worst case for a batch: every SMTP step (connect, STARTTLS, login, each
+        # message) runs into the socket timeout
+        self.lease = (batch_size + 3) * timeout + 60.0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads don't survive fork, so every worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wake = threading.Event()
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f'lead-dispatcher-{i}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        # Nothing may end this loop: ensure_started() won't replace a dead thread
+        while True:
+            try:
+                batch = self.queue.claim(self.batch_size, self.lease)
+                if batch:
+                    self._deliver(batch)
+                    continue
+            except Exception:
+                # e.g. "database is locked" while recording a result; unrecorded rows
+                # are retried once their lease expires
+                logger.exception('Lead dispatch failed')
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _deliver(self, batch):
+        try:
+            smtp = self._connect()
+        except (OSError, smtplib.SMTPException) as e:
+            for lead_id, _, attempts in batch:
+                self._retry(lead_id, attempts, e)
+            return
+        with smtp:
+            for lead_id, payload, attempts in batch:
+                try:
+                    smtp.send_message(self._message(payload))
+                except ValueError as e:
+                    # Malformed headers will never send; keep the row for inspection
+                    self.queue.mark_failed(lead_id, f'{type(e).__name__}: {e}')
+                except (OSError, smtplib.SMTPException) as e:
+                    self._retry(lead_id, attempts, e)
+                else:
+                    self.queue.mark_sent(lead_id)
+
+    def _retry(self, lead_id, attempts, error):
+        error = f'{type(error).__name__}: {error}'
+        if attempts + 1 >= self.max_attempts:
+            logger.error('Giving up on lead %s after %s attempts: %s', lead_id, attempts + 1, error)
+            self.queue.mark_failed(lead_id, error)
+            return
+        delay = min(self.backoff * 2 ** attempts, self.max_backoff) * random.uniform(0.8, 1.2)
+        logger.warning('Lead %s delivery failed (%s); retrying in %.0fs', lead_id, error, delay)
+        self.queue.mark_retry(lead_id, error, delay)
+
+    def _connect(self):
+        config = self.mail_config
+        smtp = smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=self.timeout)
+        if config['MAIL_USE_TLS']:
+            smtp.starttls()
+        if config['MAIL_USERNAME']:
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        return smtp
+
+    def _message(self, payload):
+        msg = EmailMessage()
+        msg['Subject'] = f"New inquiry from {payload['name']}"
+        msg['From'] = self.mail_config['MAIL_SENDER'] or payload['to']
+        msg['To'] = payload['to']
+        if payload['email']:
+            msg['Reply-To'] = payload['email']
+        msg.set_content(
+            f"Name: {payload['name']}\n"
+            f"Email: {payload['email']}\n"
+            f"Company: {payload['company']}\n"
+            f"Budget: {payload['budget']}\n\n"
+            f"{payload['message']}\n")
+        return msg
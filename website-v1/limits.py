@@ -0,0 +1,148 @@
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import struct
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, request
+from flask.signals import before_render_template
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+logger = logging.getLogger(__name__)
+
+# One bucket: key hash (0 = free), tokens left, monotonic time of the last update
+SLOT = struct.Struct('=Qdd')
+
+# Buckets are locked in stripes of this many slots; a key probes only its own stripe
+STRIPE = 64
+
+# Methods the per-endpoint RATE_LIMITS apply to; reads are covered by the render limit
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class RateLimiter:
+    # Token buckets in a fixed-size table of shared memory. Created before `flask serve`
+    # forks, so every worker sees the same buckets. Writers lock a stripe of the file
+    # with fcntl, which the kernel releases if a worker dies mid-update.
+    def __init__(self, slots=8192):
+        self.stripes = max(1, slots // STRIPE)
+        size = self.stripes * STRIPE * SLOT.size
+        self._file = tempfile.TemporaryFile(prefix='site-limits-')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        # fcntl locks belong to the process, so threads also need one of their own
+        self._lock = threading.Lock()
+
+    def take(self, key, requests, seconds):
+        # Spend one token from `key`'s bucket, which holds `requests` tokens and refills
+        # over `seconds`. Returns 0 if allowed, else seconds until a token is available.
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+        stripe = digest % self.stripes
+        rate = requests / seconds
+        with self._lock:
+            fcntl.lockf(self._file, fcntl.LOCK_EX, STRIPE * SLOT.size, stripe * STRIPE * SLOT.size)
+            try:
+                now = time.monotonic()
+                offset, tokens, updated = self._find(stripe, digest, now, requests)
+                tokens = min(requests, tokens + (now - updated) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                SLOT.pack_into(self._map, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN, STRIPE * SLOT.size, stripe * STRIPE * SLOT.size)
+        return wait
+
+    def _find(self, stripe, digest, now, requests):
+        # Linear probing from the key's home slot. Slots are only ever reused, never
+        # emptied, so a free slot ends the search. A full stripe gives up its least
+        # recently updated bucket, the one most likely to have refilled anyway.
+        start = stripe * STRIPE
+        victim, oldest = None, math.inf
+        for probe in range(STRIPE):
+            offset = (start + (digest // self.stripes + probe) % STRIPE) * SLOT.size
+            key, tokens, updated = SLOT.unpack_from(self._map, offset)
+            if key == digest:
+                return offset, tokens, updated
+            if key == 0:
+                return offset, requests, now
+            if updated < oldest:
+                victim, oldest = offset, updated
+        return victim, requests, now
+
+
+class RenderGate:
+    # Caps full renders in flight in this worker. Renders hold the GIL, so running more
+    # at once only makes each slower; past the cap, a request waits briefly, then gets a 503.
+    def __init__(self, limit, timeout):
+        self._slots = threading.BoundedSemaphore(limit)
+        self.timeout = timeout
+
+    def acquire(self):
+        return self._slots.acquire(timeout=self.timeout)
+
+    def release(self):
+        self._slots.release()
+
+
+def init_app(app):
+    app.config.setdefault('RATE_LIMIT', True)
+    app.config.setdefault('RATE_LIMITS', {})           # endpoint -> (requests, seconds), for writes
+    app.config.setdefault('RENDER_RATE_LIMIT', None)   # (requests, seconds) of full renders
+    app.config.setdefault('RATE_LIMIT_SLOTS', 8192)
+    app.config.setdefault('MAX_CONCURRENT_RENDERS', 4)
+    app.config.setdefault('RENDER_QUEUE_TIMEOUT', 2.0)
+    app.extensions['limits'] = (RateLimiter(app.config['RATE_LIMIT_SLOTS']),
+                                RenderGate(app.config['MAX_CONCURRENT_RENDERS'], app.config['RENDER_QUEUE_TIMEOUT']))
+
+    app.before_request(check_rate_limit)
+    # Page-cache hits never render, so this sees exactly the uncached work
+    before_render_template.connect(check_render, app)
+    app.teardown_request(release_render)
+
+
+def client_key(bucket):
+    # Behind a proxy, remote_addr is only the client's with TRUSTED_PROXIES set
+    return f'{request.remote_addr}|{bucket}'
+
+
+def _take(bucket, limit):
+    if not current_app.config['RATE_LIMIT'] or limit is None:
+        return
+    limiter = current_app.extensions['limits'][0]
+    try:
+        wait = limiter.take(client_key(bucket), *limit)
+    except OSError:
+        logger.exception('Rate limiter unavailable; allowing the request')
+        return
+    if wait:
+        if 'metrics' in current_app.extensions:
+            current_app.extensions['metrics'].inc('rate_limited_total', (('bucket', bucket),))
+        raise TooManyRequests(retry_after=math.ceil(wait))
+
+
+def check_rate_limit():
+    if request.method in WRITE_METHODS:
+        _take(request.endpoint, current_app.config['RATE_LIMITS'].get(request.endpoint))
+
+
+def check_render(sender, template, context, **extra):
+    if g.get('_render_slot'):
+        return  # one slot (and one token) per request, however many templates it renders
+    _take('render', current_app.config['RENDER_RATE_LIMIT'])
+    if not current_app.extensions['limits'][1].acquire():
+        if 'metrics' in current_app.extensions:
+            current_app.extensions['metrics'].inc('render_rejected_total', ())
+        raise ServiceUnavailable(retry_after=1)
+    g._render_slot = True
+
+
+def release_render(exc):
+    if g.pop('_render_slot', False):
+        current_app.extensions['limits'][1].release()
@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Response, before_render_template, g, request, template_rendered
+from jinja2 import meta
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Registry:
+    # Per-process counters and histograms. Observations take one short lock;
+    # under a prefork server a thread in each worker also flushes a snapshot to
+    # METRICS_DIR, so /metrics in any worker can report totals for all of them.
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+        self.collectors = []    # callables returning [(name, labels, value)] read at snapshot time
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._pid = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, labels, seconds):
+        key = (name, labels)
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            row = self.histograms.get(key)
+            if row is None:
+                row = self.histograms[key] = [0] * (len(BUCKETS) + 3)
+            row[index] += 1
+            row[-2] += seconds
+            row[-1] += 1
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), list(row)] for (name, labels), row in self.histograms.items()]
+        for collect in self.collectors:
+            counters.extend([name, list(labels), value] for name, labels, value in collect())
+        return {'counters': counters, 'histograms': histograms}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self._dirty = False
+        # Stops this process's flush thread, so warm-up before fork leaves none behind
+        self._pid = None
+        if self.directory:
+            try:
+                os.remove(os.path.join(self.directory, f'{os.getpid()}.json'))
+            except FileNotFoundError:
+                pass
+
+    def ensure_started(self):
+        # Threads don't survive fork, so every worker process starts its own
+        if not self.directory or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, args=(self._pid,), name='metrics-flush', daemon=True).start()
+
+    def _run(self, pid):
+        # Flushes on a timer rather than on the next request, so a worker's last
+        # observations before it goes idle still reach the others
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty and self._pid == pid:
+                try:
+                    self.flush()
+                except OSError:
+                    logger.exception('Metrics flush failed')
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._dirty = False
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        # Sum of every worker's latest snapshot, with this process's live values
+        snapshots = {os.getpid(): self.snapshot()}
+        if self.directory:
+            for filename in os.listdir(self.directory):
+                pid, ext = os.path.splitext(filename)
+                if ext == '.json' and pid.isdigit() and int(pid) not in snapshots:
+                    try:
+                        with open(os.path.join(self.directory, filename)) as f:
+                            snapshots[int(pid)] = json.load(f)
+                    except (OSError, ValueError):
+                        continue  # a worker is mid-write or has just been reaped
+        counters, histograms = {}, {}
+        for snapshot in snapshots.values():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, row in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(row))
+                for i, value in enumerate(row):
+                    total[i] += value
+        return counters, histograms
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + '}'
+
+
+def exposition(counters, histograms, gauges=()):
+    # Prometheus text format
+    lines, typed = [], set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        declare(name, 'counter')
+        lines.append(f'{name}{_labels(labels)} {value:g}')
+    for (name, labels), row in sorted(histograms.items()):
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), row):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {row[-2]:g}')
+        lines.append(f'{name}_count{_labels(labels)} {row[-1]}')
+    for name, labels, value in gauges:
+        declare(name, 'gauge')
+        lines.append(f'{name}{_labels(labels)} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+_chains = {}
+
+
+def _template_chain(env, name):
+    # "home.html" -> "home.html<base.html": the layouts rendered as part of the page
+    if name not in _chains:
+        source = env.loader.get_source(env, name)[0]
+        parents = [parent for parent in meta.find_referenced_templates(env.parse(source)) if parent]
+        _chains[name] = '<'.join([name] + [_template_chain(env, parent) for parent in parents])
+    return _chains[name]
+
+
+def init_app(app, gauges=None):
+    # `gauges()` returns [(name, labels, value)] computed at scrape time (e.g. queue depth)
+    registry = Registry(app.config.get('METRICS_DIR'))
+    app.extensions['metrics'] = registry
+
+    # Context processors run before the template's render signal, so time them directly
+    def timed(processor):
+        @wraps(processor)
+        def wrapper():
+            start = time.perf_counter()
+            try:
+                return processor()
+            finally:
+                g._ctx_time = g.get('_ctx_time', 0.0) + time.perf_counter() - start
+        return wrapper
+
+    for processors in app.template_context_processors.values():
+        processors[:] = [timed(processor) for processor in processors]
+
+    @app.before_request
+    def start_timer():
+        g._start = time.perf_counter()
+        g._renders = []
+
+    @before_render_template.connect_via(app)
+    def render_started(sender, template, context, **extra):
+        g._render_start = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def render_finished(sender, template, context, **extra):
+        if '_render_start' in g:
+            g._renders.append((template.name, time.perf_counter() - g.pop('_render_start')))
+
+    @app.after_request
+    def record(response):
+        if '_start' not in g:
+            return response
+        total = time.perf_counter() - g._start
+        render = sum(seconds for _, seconds in g._renders)
+        ctx = g.get('_ctx_time', 0.0)
+
+        timings = [f'view;dur={(total - render - ctx) * 1000:.2f}', f'ctx;dur={ctx * 1000:.2f}']
+        for name, seconds in g._renders:
+            desc = _template_chain(app.jinja_env, name)
+            timings.append(f'render;dur={seconds * 1000:.2f};desc="{desc}"')
+            registry.observe('template_render_seconds', (('template', desc),), seconds)
+        if 'page_cache' in g:
+            timings.append(f'cache;desc="{g.page_cache}"')
+        timings.append(f'total;dur={total * 1000:.2f}')
+        response.headers.add('Server-Timing', ', '.join(timings))
+
+        endpoint = request.endpoint or 'unmatched'
+        registry.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                             ('status', str(response.status_code))))
+        registry.observe('http_request_duration_seconds', (('endpoint', endpoint),), total)
+        registry.ensure_started()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        counters, histograms = registry.collect()
+        extra = list(gauges()) if gauges else []
+        hits = sum(v for (name, _), v in counters.items() if name == 'page_cache_hits_total')
+        misses = sum(v for (name, _), v in counters.items() if name == 'page_cache_misses_total')
+        if hits + misses:
+            extra.append(('page_cache_hit_ratio', (), hits / (hits + misses)))
+        return Response(exposition(counters, histograms, extra),
+                        mimetype='text/plain; version=0.0.4',
+                        headers={'Cache-Control': 'no-store'})
+
+    return registry
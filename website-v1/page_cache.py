@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timezone
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, redirect, request
+from werkzeug.http import is_resource_modified
+
+from compression import compress, negotiate
+from content import current_content
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def templates_version(app, *extra):
+    # Template edits (and anything else baked into pages, like asset URLs) change
+    # rendered output too, so they feed into the version
+    loader = app.jinja_env.loader
+    digest = hashlib.sha1()
+    for name in sorted(loader.list_templates()):
+        digest.update(loader.get_source(app.jinja_env, name)[0].encode('utf-8'))
+    digest.update(json.dumps(extra, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def last_modified(*paths):
+    # Newest mtime across the given files
+    mtime = max(os.path.getmtime(path) for path in paths)
+    return datetime.fromtimestamp(int(mtime), timezone.utc)
+
+
+class CachedPage:
+    # A rendered page and its compressed variants, each produced at most once
+    __slots__ = ('body', 'variants')
+
+    def __init__(self, body):
+        self.body = body.encode('utf-8')
+        self.variants = {None: self.body}
+
+    @property
+    def size(self):
+        return sum(len(data) for data in self.variants.values())
+
+
+class PageCache:
+    # Bounded LRU of rendered pages, limited by entry count and by bytes held, plus a
+    # small negative cache of the redirects served for unknown service and case study ids
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, max_redirects=1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._redirects = OrderedDict()   # key -> (location, status)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = page
+            self.size += page.size
+            self._evict()
+
+    def get_redirect(self, key):
+        # Checked before the page itself, so a miss here costs no page-cache miss
+        with self._lock:
+            redirect_to = self._redirects.get(key)
+            if redirect_to is not None:
+                self._redirects.move_to_end(key)
+            return redirect_to
+
+    def set_redirect(self, key, location, status):
+        # Unknown ids are unbounded, so they get their own LRU rather than evicting pages
+        with self._lock:
+            self._redirects[key] = (location, status)
+            self._redirects.move_to_end(key)
+            while len(self._redirects) > self.max_redirects:
+                self._redirects.popitem(last=False)
+
+    def variant(self, key, page, encoding):
+        # Compressed variants are made on first request, so a stored page grows. That
+        # request waits for it (and holds a render slot), so it gets the fast level:
+        # brotli 11 is ~40x slower for ~15% smaller pages, and entries turn over on every
+        # content reload and at midnight.
+        data = page.variants.get(encoding)
+        if data is None:
+            data = compress(page.body, encoding)
+            with self._lock:
+                if encoding not in page.variants:
+                    page.variants[encoding] = data
+                    if self._entries.get(key) is page:
+                        self.size += len(data)
+                        self._evict()
+        return data
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+            _, page = self._entries.popitem(last=False)
+            self.size -= page.size
+
+    def sync_version(self, version):
+        # Entries rendered from older content can never be hit again, so drop them now
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self._entries.clear()
+                    self._redirects.clear()
+                    self.size = 0
+                    self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._redirects.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def utc_today():
+    # The one calendar the page cache, its validators and templates' `now` agree on
+    return datetime.now(timezone.utc).date()
+
+
+def page_cache_key(version, day, query_args=()):
+    # `now` is injected into every template, so entries are scoped to the current day.
+    # Query arguments count only if the view reads them; the rest can't change the page.
+    return (request.endpoint,
+            tuple(sorted(request.view_args.items())),
+            tuple((name, tuple(sorted(request.args.getlist(name)))) for name in query_args),
+            version,
+            day.isoformat())
+
+
+def page_validators(key, day, content, templates_last_modified):
+    # Both validators are derived from the cache key, so they are known before rendering
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    day_start = datetime.combine(day, time(), timezone.utc)
+    return etag, max(content.last_modified, templates_last_modified, day_start)
+
+
+def cached_page(view=None, *, query_args=()):
+    # `@cached_page`, or `@cached_page(query_args=(...))` for views that read the query string
+    if view is None:
+        return lambda view: cached_page(view, query_args=query_args)
+
+    @wraps(view)
+    def wrapper(**view_args):
+        tenant = current_app.extensions['tenants'].current()
+        cache = tenant.page_cache
+        # The session only carries flashed messages, which base.html renders into the
+        # page, so requests with a session cookie are never shared. Checking the cookie
+        # rather than the session keeps `Vary: Cookie` off cacheable responses.
+        session_cookie = current_app.config['SESSION_COOKIE_NAME']
+        if not current_app.config['PAGE_CACHE'] or request.method not in ('GET', 'HEAD') or session_cookie in request.cookies:
+            return view(**view_args)
+
+        content = current_content()
+        version = (tenant.name, content.version, tenant.templates_version)
+        cache.sync_version(version)
+        day = utc_today()
+        key = page_cache_key(version, day, query_args)
+        etag, modified = page_validators(key, day, content, tenant.templates_last_modified)
+        # Each encoding is a separate representation, so it gets its own strong ETag
+        encoding = negotiate()
+        if encoding:
+            etag = f'{etag}-{encoding}'
+
+        redirect_to = cache.get_redirect(key)
+        if redirect_to is not None:
+            g.page_cache = 'redirect'
+            return redirect(*redirect_to)
+        # Validators say nothing about whether the key is a page at all, so a 304 is only
+        # sent once this key is known to render: it's cached, or it just rendered
+        page = cache.get(key)
+        g.page_cache = 'miss' if page is None else 'hit'
+        if page is None:
+            rv = view(**view_args)
+            # Redirects for unknown ids are remembered, so repeats skip the view entirely
+            if isinstance(rv, Response) and rv.status_code in REDIRECT_STATUSES and 'Set-Cookie' not in rv.headers:
+                cache.set_redirect(key, rv.location, rv.status_code)
+            if not isinstance(rv, str):
+                return rv
+            page = CachedPage(rv)
+            cache.set(key, page)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+            g.page_cache = 'not-modified'
+            response = make_response('', 304)
+        else:
+            if len(page.body) < current_app.config['COMPRESS_MIN_SIZE']:
+                encoding = None
+            response = make_response(cache.variant(key, page, encoding))
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        response.last_modified = modified
+        return response
+    return wrapper
@@ -0,0 +1,200 @@
+import math
+from collections import Counter
+
+from search import tokenize
+
+# How much each signal contributes to a similarity in [0, 1]
+WEIGHTS = {'tech': 0.5, 'industry': 0.2, 'text': 0.3}
+
+# Spellings of the same technology across services and case studies
+TECH_ALIASES = {
+    'lightning web components': 'lwc',
+    'salesforce platform': 'salesforce',
+    'rest apis': 'rest api',
+    'queueables': 'queueable',
+    'shield platform encryption': 'shield',
+}
+
+# Prose fields compared for text similarity
+TEXT_FIELDS = {
+    'service': ('title', 'short_description', 'full_description', 'outcomes'),
+    'project': ('title', 'tagline', 'problem', 'solution'),
+}
+
+STOPWORDS = frozenset('''
+    and are for from has have into its not our that the their them then these this those through was were
+    which while who will with within without your you can all any but each more most other over such than
+    per via also across when where what how only just new use using used
+'''.split())
+
+# Pairs scoring below this share nothing meaningful and are never recommended
+MIN_SCORE = 0.05
+
+# Rounding headroom for score bounds; a cosine can come out a hair above 1
+BOUND_SLACK = 1e-9
+
+
+def normalize_tech(name):
+    name = name.strip().lower()
+    return TECH_ALIASES.get(name, name)
+
+
+def _text_vector(item, kind):
+    terms = Counter()
+    for field in TEXT_FIELDS[kind]:
+        value = getattr(item, field)
+        for term in tokenize(' '.join(value) if isinstance(value, tuple) else value):
+            if len(term) > 2 and term not in STOPWORDS:
+                terms[term] += 1
+    vector = {term: 1 + math.log(count) for term, count in terms.items()}
+    return vector, math.sqrt(sum(weight * weight for weight in vector.values()))
+
+
+class RelatedIndex:
+    # Top-k most similar case studies for every service and case study. Only case studies
+    # sharing a technology or the industry are candidates, found through inverted indexes,
+    # and only the top k are kept per item. Items with neither fall back to the text alone.
+    # Like SearchIndex, an index is never mutated once published: build() from a
+    # previous index copies it and re-ranks only the rows an edit can affect.
+    def __init__(self, k=5):
+        self.k = k
+        self.features = {}     # (kind, id) -> (item, techs, industry, text vector, vector norm)
+        self.postings = {}     # ('tech' | 'industry', value) -> {(kind, id), ...}
+        self.neighbours = {}   # (kind, id) -> ((project id, similarity), ...) best first
+
+    @classmethod
+    def build(cls, repository, previous=None, k=5):
+        index = previous._copy() if previous and previous.k == k else cls(k)
+        items = {('service', service.id): service for service in repository.services}
+        items.update({('project', project.id): project for project in repository.projects})
+
+        touched = set()
+        removed = index.features.keys() - items.keys()
+        for key in removed:
+            index._remove(key, touched)
+            del index.neighbours[key]
+        changed = set()
+        for key, item in items.items():
+            current = index.features.get(key)
+            # Frozen records compare by value, so unchanged items keep their rankings
+            if current is None or current[0] != item:
+                if current is not None:
+                    index._remove(key, touched)
+                index._add(key, item, touched)
+                changed.add(key)
+
+        # Changed rows, and rows that ranked a changed or removed case study, start over
+        columns = {key[1] for key in changed | removed if key[0] == 'project'}
+        dirty = set(changed)
+        if columns:
+            dirty.update(key for key, ranked in index.neighbours.items()
+                         if any(project_id in columns for project_id, _ in ranked))
+        for key in dirty:
+            index.neighbours[key] = index._rank(key)
+        # Anywhere else a changed or added case study can only push its way in
+        untagged = {key for key, features in index.features.items() if not features[1] and not features[2]}
+        for column in changed:
+            if column[0] == 'project':
+                for key in (index._candidates(column) | untagged) - dirty - {column}:
+                    index._offer(key, column)
+        return index
+
+    def _copy(self):
+        index = RelatedIndex(self.k)
+        index.features = dict(self.features)
+        index.postings = dict(self.postings)
+        index.neighbours = dict(self.neighbours)
+        return index
+
+    def _features(self, key, item):
+        kind = key[0]
+        techs = frozenset(normalize_tech(tech) for tech in
+                          (item.tech_highlights if kind == 'service' else item.tech_stack))
+        industry = item.industry.strip().lower() if kind == 'project' else ''
+        return (item, techs, industry) + _text_vector(item, kind)
+
+    def _tokens(self, key):
+        _, techs, industry, _, _ = self.features[key]
+        return [('tech', tech) for tech in techs] + ([('industry', industry)] if industry else [])
+
+    def _posting(self, token, touched):
+        # Copy a shared posting set before its first write
+        if token not in touched:
+            self.postings[token] = set(self.postings.get(token, ()))
+            touched.add(token)
+        return self.postings.setdefault(token, set())
+
+    def _add(self, key, item, touched):
+        self.features[key] = self._features(key, item)
+        for token in self._tokens(key):
+            self._posting(token, touched).add(key)
+
+    def _remove(self, key, touched):
+        for token in self._tokens(key):
+            posting = self._posting(token, touched)
+            posting.discard(key)
+            if not posting:
+                del self.postings[token]
+        del self.features[key]
+
+    def _candidates(self, key):
+        # Every other item sharing a technology or the industry with `key`
+        keys = set()
+        for token in self._tokens(key):
+            keys.update(self.postings.get(token, ()))
+        keys.discard(key)
+        return keys
+
+    def _similarity(self, a, b):
+        _, techs_a, industry_a, vector_a, norm_a = self.features[a]
+        _, techs_b, industry_b, vector_b, norm_b = self.features[b]
+        tech = len(techs_a & techs_b) / len(techs_a | techs_b) if techs_a or techs_b else 0.0
+        industry = 1.0 if industry_a and industry_a == industry_b else 0.0
+        text = 0.0
+        if norm_a and norm_b:
+            shared = vector_a.keys() & vector_b.keys()
+            text = math.fsum(vector_a[term] * vector_b[term] for term in shared) / (norm_a * norm_b)
+        return WEIGHTS['tech'] * tech + WEIGHTS['industry'] * industry + WEIGHTS['text'] * text
+
+    def _rank(self, key):
+        # Shared technologies and industry fix most of a score, so with the text taken as
+        # a perfect match they bound it. Candidates are scored in order of that bound
+        # until none left can displace the k-th best. An item with neither is compared
+        # with every case study.
+        _, techs, industry, _, _ = self.features[key]
+        shared = Counter()
+        for tech in techs:
+            shared.update(self.postings.get(('tech', tech), ()))
+        same_industry = self.postings.get(('industry', industry), set()) if industry else set()
+        candidates = shared.keys() | same_industry if techs or industry else self.features
+        bounds = []
+        for other in candidates:
+            if other[0] != 'project' or other == key:
+                continue
+            count = shared[other]
+            tech = count / (len(techs) + len(self.features[other][1]) - count) if count else 0.0
+            bound = (WEIGHTS['tech'] * tech + WEIGHTS['industry'] * (other in same_industry)
+                     + WEIGHTS['text'] + BOUND_SLACK)
+            bounds.append((bound, other))
+        bounds.sort(key=lambda candidate: (-candidate[0], candidate[1][1]))
+
+        ranked = []
+        for bound, other in bounds:
+            if len(ranked) == self.k and bound < ranked[-1][1]:
+                break
+            ranked = self._insert(ranked, other[1], self._similarity(key, other))
+        return tuple(ranked)
+
+    def _insert(self, ranked, project_id, score):
+        # Ties go to the lower id so the order doesn't depend on scoring order
+        if score < MIN_SCORE or len(ranked) == self.k and (-score, project_id) > (-ranked[-1][1], ranked[-1][0]):
+            return ranked
+        ranked = sorted(ranked + [(project_id, score)], key=lambda item: (-item[1], item[0]))
+        return ranked[:self.k]
+
+    def _offer(self, key, column):
+        ranked = self._insert(list(self.neighbours[key]), column[1], self._similarity(key, column))
+        self.neighbours[key] = tuple(ranked)
+
+    def related(self, kind, item_id, limit):
+        return self.neighbours.get((kind, item_id), ())[:limit]
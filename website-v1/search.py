@@ -0,0 +1,125 @@
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Field -> weight; a title hit counts for more than one buried in the solution text
+FIELDS = {
+    'service': {'title': 3.0, 'short_description': 1.5, 'full_description': 1.0, 'deliverables': 1.0,
+                'outcomes': 1.0, 'tech_highlights': 2.0, 'ideal_for': 1.0},
+    'project': {'title': 3.0, 'tagline': 1.5, 'client': 1.5, 'industry': 2.0, 'problem': 1.0,
+                'solution': 1.0, 'tech_stack': 2.0, 'results': 1.0},
+}
+
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def _field_text(value):
+    return ' '.join(value) if isinstance(value, tuple) else str(value)
+
+
+class SearchIndex:
+    # In-memory inverted index with BM25 ranking over services and case studies.
+    # An index is never mutated once published; build() from a previous index copies it,
+    # sharing every posting list it does not need to touch.
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}        # (kind, id) -> (item, weighted length, {term: weighted tf})
+        self.postings = {}    # term -> {(kind, id): weighted tf}
+        self.total_length = 0.0
+        self.terms = []       # sorted vocabulary for prefix lookups
+
+    @classmethod
+    def build(cls, repository, previous=None):
+        index = previous._copy() if previous else cls()
+        items = {('service', service.id): service for service in repository.services}
+        items.update({('project', project.id): project for project in repository.projects})
+
+        touched = set()
+        for key in index.docs.keys() - items.keys():
+            index._remove(key, touched)
+        for key, item in items.items():
+            current = index.docs.get(key)
+            # Frozen records compare by value, so unchanged items are skipped without re-tokenizing
+            if current is None or current[0] != item:
+                if current is not None:
+                    index._remove(key, touched)
+                index._add(key, item, touched)
+        if touched:
+            index.terms = sorted(index.postings)
+        return index
+
+    def _copy(self):
+        index = SearchIndex(self.k1, self.b)
+        index.docs = dict(self.docs)
+        index.postings = dict(self.postings)
+        index.total_length = self.total_length
+        index.terms = self.terms
+        return index
+
+    def _posting(self, term, touched):
+        # Copy a shared posting list before its first write
+        if term not in touched:
+            self.postings[term] = dict(self.postings.get(term, ()))
+            touched.add(term)
+        return self.postings.setdefault(term, {})
+
+    def _add(self, key, item, touched):
+        freqs = Counter()
+        for field, weight in FIELDS[key[0]].items():
+            for term in tokenize(_field_text(getattr(item, field))):
+                freqs[term] += weight
+        length = sum(freqs.values())
+        self.docs[key] = (item, length, freqs)
+        self.total_length += length
+        for term, tf in freqs.items():
+            self._posting(term, touched)[key] = tf
+
+    def _remove(self, key, touched):
+        _, length, freqs = self.docs.pop(key)
+        self.total_length -= length
+        for term in freqs:
+            posting = self._posting(term, touched)
+            del posting[key]
+            if not posting:
+                del self.postings[term]
+
+    def _expand(self, prefix):
+        start = bisect_left(self.terms, prefix)
+        expansions = []
+        for term in self.terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+
+    def search(self, query, limit=10, prefix=True, kind=None):
+        # With `prefix`, the last query word also matches longer terms ("heal" -> "health")
+        words = tokenize(query)
+        if not words or not self.docs:
+            return []
+        groups = [[word] for word in words[:-1]]
+        groups.append(self._expand(words[-1]) if prefix else [words[-1]])
+
+        n = len(self.docs)
+        average = self.total_length / n
+        scores = Counter()
+        for group in groups:
+            for term in group:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for key, tf in posting.items():
+                    if kind and key[0] != kind:
+                        continue
+                    length = self.docs[key][1]
+                    scores[key] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+        return [(key[0], self.docs[key][0], score) for key, score in scores.most_common(limit)]
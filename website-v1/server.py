@@ -0,0 +1,204 @@
+import errno
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+
+import click
+from dotenv import dotenv_values
+from werkzeug.serving import make_server
+
+from warmup import warm
+
+logger = logging.getLogger(__name__)
+
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGQUIT}
+
+# A worker that dies sooner than this after starting is respawned after a pause,
+# so a broken deploy doesn't fork in a tight loop
+MIN_WORKER_LIFETIME = 1.0
+
+
+def init_app(app, factory, placeholder_secret_keys=()):
+    # `factory(config)` builds a fresh app; SIGHUP uses it to reload without dropping requests.
+    # Apps whose SECRET_KEY is unset or one of `placeholder_secret_keys` are never served.
+    app.extensions['serve'] = {'placeholder_secret_keys': frozenset(placeholder_secret_keys)}
+
+    @app.cli.command('serve')
+    @click.option('--host', default=os.environ.get('HOST', '0.0.0.0'), show_default=True)
+    @click.option('--port', default=int(os.environ.get('PORT', 8000)), show_default=True)
+    @click.option('--workers', '-w', default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+                  show_default='CPU count', help='Worker processes.')
+    @click.option('--graceful-timeout', default=30.0, show_default=True,
+                  help='Seconds a stopping worker may spend finishing requests.')
+    def serve_command(host, port, workers, graceful_timeout):
+        """Serve the site from a pool of preforked worker processes."""
+        serve(app, factory, host, port, workers, graceful_timeout)
+
+
+def check_secret_key(app, placeholders):
+    # Anyone who knows the key can forge session cookies, and so flashed messages
+    if not app.config.get('SECRET_KEY') or app.config['SECRET_KEY'] in placeholders:
+        raise click.ClickException('SECRET_KEY is unset or still the placeholder; set it in the environment '
+                                   'or .env, e.g. SECRET_KEY=$(python -c "import secrets; print(secrets.token_hex())")')
+
+
+def preload(app):
+    # Runs in the master before fork, so workers share all of this copy-on-write
+    app.url_map.update()
+    stats = warm(app)
+    click.echo('Preloaded {templates} templates ({compile_ms:.0f}ms) and {pages} pages ({render_ms:.0f}ms)'.format(
+        **stats))
+    # Long-lived load-time objects: keep the collector from touching (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def serve(app, factory, host, port, workers, graceful_timeout=30.0):
+    placeholders = app.extensions['serve']['placeholder_secret_keys']
+    check_secret_key(app, placeholders)
+    listener = socket.create_server((host, port), backlog=2048)
+    # Workers each write a metrics snapshot here; /metrics in any of them sums the lot
+    metrics_dir = app.config['METRICS_DIR'] or tempfile.mkdtemp(prefix='site-metrics-')
+    for filename in os.listdir(metrics_dir) if os.path.isdir(metrics_dir) else ():
+        if filename.endswith('.json'):
+            os.remove(os.path.join(metrics_dir, filename))
+    config = {'METRICS_DIR': metrics_dir}
+    # The flask command has already copied .env into os.environ; forget those copies
+    # so the factory re-reads .env on reload instead of seeing the startup values
+    dotenv = os.path.join(app.root_path, '.env')
+    for key, value in dotenv_values(dotenv).items():
+        if os.environ.get(key) == value:
+            del os.environ[key]
+
+    # The master only forks, reaps and handles signals, which it reads synchronously
+    signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS | {signal.SIGHUP, signal.SIGCHLD})
+    started = time.perf_counter()
+    current = factory(config)
+    click.echo(f'Built app in {(time.perf_counter() - started) * 1000:.0f}ms')
+    current = preload(current)
+    children = {}    # pid -> start time, for the current generation
+    retiring = {}    # pid -> kill deadline, for workers finishing their last requests
+    stopping = False
+
+    def spawn():
+        pid = _fork_worker(current, listener, host, port)
+        children[pid] = time.monotonic()
+
+    for _ in range(workers):
+        spawn()
+    click.echo(f'Serving on http://{host}:{port} with {workers} workers (master pid {os.getpid()})')
+
+    while children or retiring:
+        info = signal.sigtimedwait(STOP_SIGNALS | {signal.SIGHUP, signal.SIGCHLD}, 1.0)
+        signum = info.si_signo if info else None
+
+        if signum == signal.SIGHUP and not stopping:
+            # New content, templates and .env: build and preload a fresh app, start its
+            # workers, then let the old ones drain. Code changes still need a restart.
+            gc.unfreeze()
+            try:
+                reloaded = factory(config)
+                check_secret_key(reloaded, placeholders)
+                current = preload(reloaded)
+            except Exception:
+                logger.exception('Reload failed; keeping the current workers')
+                gc.freeze()
+            else:
+                old = list(children)
+                children.clear()
+                for _ in range(workers):
+                    spawn()
+                _retire(old, retiring, graceful_timeout)
+                click.echo(f'Reloaded; {len(old)} old workers finishing their requests')
+        elif signum in STOP_SIGNALS and not stopping:
+            stopping = True
+            click.echo('Shutting down')
+            _retire(list(children), retiring, graceful_timeout)
+            children.clear()
+
+        for pid, status in _reap():
+            if retiring.pop(pid, None) is not None or pid not in children:
+                continue
+            started = children.pop(pid)
+            logger.error('Worker %s exited with status %s; replacing it', pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            spawn()
+
+        now = time.monotonic()
+        for pid, deadline in list(retiring.items()):
+            if now >= deadline:
+                logger.warning('Worker %s did not finish within %ss; killing it', pid, graceful_timeout)
+                _signal(pid, signal.SIGKILL)
+                retiring[pid] = float('inf')
+
+    listener.close()
+    if not app.config['METRICS_DIR']:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def _fork_worker(app, listener, host, port):
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 0
+    try:
+        _run_worker(app, listener, host, port)
+    except BaseException:
+        logger.exception('Worker crashed')
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _run_worker(app, listener, host, port):
+    # Stop signals stay blocked and are collected with sigwait(); every thread
+    # started below inherits the mask, so none of them is interrupted mid-request
+    signal.pthread_sigmask(signal.SIG_SETMASK, STOP_SIGNALS)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if app.config['LEADS_DISPATCH']:
+        # Threads don't survive fork; each worker drains the lead queue itself
+        app.extensions['lead_dispatcher'].ensure_started()
+    app.extensions['metrics'].ensure_started()
+
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    threading.Thread(target=server.serve_forever, name='accept', daemon=True).start()
+    signal.sigwait(STOP_SIGNALS)
+    server.shutdown()       # stop accepting
+    server.server_close()   # wait for in-flight requests
+    # Totals from a retired worker keep counting towards /metrics
+    app.extensions['metrics'].flush()
+
+
+def _retire(pids, retiring, graceful_timeout):
+    deadline = time.monotonic() + graceful_timeout
+    for pid in pids:
+        retiring[pid] = deadline
+        _signal(pid, signal.SIGTERM)
+
+
+def _signal(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass  # already exited; reaped on the next pass
+
+
+def _reap():
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except OSError as e:
+            if e.errno == errno.ECHILD:
+                return
+            raise
+        if pid == 0:
+            return
+        yield pid, status
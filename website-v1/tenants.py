@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+
+from flask import current_app, g, has_request_context, request
+from flask import render_template as _render_template
+from jinja2 import ChoiceLoader, FileSystemLoader
+
+from content import ContentStore
+from fragment_cache import FragmentCache
+from page_cache import PageCache, last_modified
+
+# Keys allowed for each tenant in the TENANTS_PATH file
+TENANT_FIELDS = ('hosts', 'content', 'templates', 'page_cache_bytes', 'fragment_cache_bytes')
+
+
+class Tenant:
+    # One brand served by this process: its content, optional template overrides and
+    # its own render caches, so a busy tenant only ever evicts its own pages
+    def __init__(self, name, hosts, store, jinja_env, templates_version, templates_last_modified,
+                 page_cache, fragment_cache):
+        self.name = name
+        self.hosts = hosts
+        self.store = store
+        self.jinja_env = jinja_env
+        self.templates_version = templates_version
+        self.templates_last_modified = templates_last_modified
+        self.page_cache = page_cache
+        self.fragment_cache = fragment_cache
+
+
+class TenantRegistry:
+    def __init__(self, default, tenants=()):
+        self.default = default
+        self.tenants = {default.name: default}
+        self.by_host = {}
+        for tenant in tenants:
+            if tenant.name in self.tenants:
+                raise ValueError(f'tenants: duplicate tenant {tenant.name!r}')
+            self.tenants[tenant.name] = tenant
+            for host in tenant.hosts:
+                if host in self.by_host:
+                    raise ValueError(f'tenants: {host} is listed for both {self.by_host[host].name} and {tenant.name}')
+                self.by_host[host] = tenant
+
+    def resolve(self, host):
+        # Hosts no tenant claims get the default site, like a default server block
+        host = host.lower()
+        if not host.endswith(']'):  # strip the port, but not from a bare IPv6 literal
+            host = host.rsplit(':', 1)[0]
+        return self.by_host.get(host, self.default)
+
+    def current(self):
+        if not has_request_context():
+            return self.default
+        tenant = g.get('tenant')
+        if tenant is None:
+            tenant = g.tenant = self.resolve(request.host)
+        return tenant
+
+    def __iter__(self):
+        return iter(self.tenants.values())
+
+
+def init_app(app):
+    # The default tenant is the site in CONTENT_PATH with the shared templates. TENANTS_PATH
+    # names a JSON file of further tenants keyed by name; relative paths in it are relative
+    # to the file:
+    #   {"acme": {"hosts": ["acme.example"], "content": "acme/data", "templates": "acme/templates"}}
+    default = _tenant(app, 'default', (), app.config['CONTENT_PATH'], None, {})
+    tenants = []
+    if app.config.get('TENANTS_PATH'):
+        with open(app.config['TENANTS_PATH']) as f:
+            definitions = json.load(f)
+        base = os.path.dirname(os.path.abspath(app.config['TENANTS_PATH']))
+        for name, definition in definitions.items():
+            unknown = definition.keys() - set(TENANT_FIELDS)
+            if unknown:
+                raise ValueError(f'tenants: unknown field(s) {", ".join(sorted(unknown))} for {name}')
+            if not definition.get('hosts') or 'content' not in definition:
+                raise ValueError(f'tenants: {name} needs "hosts" and "content"')
+            templates = definition.get('templates')
+            tenants.append(_tenant(app, name, tuple(host.lower() for host in definition['hosts']),
+                                   os.path.join(base, definition['content']),
+                                   os.path.join(base, templates) if templates else None,
+                                   definition))
+    app.extensions['tenants'] = TenantRegistry(default, tenants)
+    return app.extensions['tenants']
+
+
+def _tenant(app, name, hosts, content_path, templates, definition):
+    jinja_env = app.jinja_env
+    version = app.config['TEMPLATES_VERSION']
+    modified = app.config['TEMPLATES_LAST_MODIFIED']
+    if templates:
+        # Only tenants that override something get their own environment. It shares the
+        # globals, extensions and bytecode cache, but needs its own template cache: a shared
+        # home.html extends whichever base.html its environment resolves.
+        jinja_env = app.jinja_env.overlay(loader=ChoiceLoader([FileSystemLoader(templates), app.jinja_env.loader]),
+                                          cache_size=400)
+        overrides = FileSystemLoader(templates)
+        digest = hashlib.sha1(version.encode('utf-8'))
+        for template in sorted(overrides.list_templates()):
+            digest.update(template.encode('utf-8'))
+            digest.update(overrides.get_source(jinja_env, template)[0].encode('utf-8'))
+        version = digest.hexdigest()[:16]
+        paths = [os.path.join(templates, template) for template in overrides.list_templates()]
+        if paths:
+            modified = max(modified, last_modified(*paths))
+    return Tenant(
+        name, hosts,
+        ContentStore(content_path, app.config['CONTENT_CHECK_INTERVAL']),
+        jinja_env, version, modified,
+        PageCache(app.config['PAGE_CACHE_SIZE'], definition.get('page_cache_bytes', app.config['PAGE_CACHE_MAX_BYTES'])),
+        FragmentCache(definition.get('fragment_cache_bytes', app.config['FRAGMENT_CACHE_MAX_BYTES'])))
+
+
+def current_tenant():
+    return current_app.extensions['tenants'].current()
+
+
+def current_fragment_cache():
+    # For {% cache %} blocks: the tenant's cache and the version its fragments belong to.
+    # PAGE_CACHE covers fragments too, so with it off every block renders.
+    if not current_app.config['PAGE_CACHE']:
+        return None, None
+    tenant = current_tenant()
+    return tenant.fragment_cache, (tenant.store.current().version, tenant.templates_version)
+
+
+def render_template(template_name, **context):
+    # flask.render_template, but from the tenant's environment so its overrides apply
+    return _render_template(current_tenant().jinja_env.get_template(template_name), **context)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The site's modules live at the top level of website-v1
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
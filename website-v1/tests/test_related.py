@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from content import ContentRepository, open_source
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+@pytest.fixture(scope='module')
+def documents():
+    return open_source(DATA).load()
+
+
+def _with_projects(documents, projects):
+    docs, version, last_modified = documents
+    return dict(docs, projects=projects), version + '-edited', last_modified
+
+
+def _assert_incremental_matches_full(documents, projects):
+    base = ContentRepository(*documents)
+    edited = _with_projects(documents, projects)
+    incremental = ContentRepository(*edited, previous=base)
+    full = ContentRepository(*edited)
+    assert incremental.related_index.neighbours == full.related_index.neighbours
+    assert incremental.related_index.postings == full.related_index.postings
+
+
+def test_edit_matches_full_build(documents):
+    # Most case studies are the only holder of some technology, whose posting empties
+    # and refills within one build
+    projects = documents[0]['projects']
+    for position, project in enumerate(projects):
+        edited = list(projects)
+        edited[position] = dict(project, tagline=project['tagline'] + ' x')
+        _assert_incremental_matches_full(documents, edited)
+
+
+def test_remove_and_add_match_full_build(documents):
+    projects = documents[0]['projects']
+    for position in range(len(projects)):
+        _assert_incremental_matches_full(documents, projects[:position] + projects[position + 1:])
+    renamed = dict(projects[0], id=projects[0]['id'] + '-copy')
+    _assert_incremental_matches_full(documents, projects + [renamed])
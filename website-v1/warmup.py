@@ -0,0 +1,86 @@
+import logging
+import os
+import time
+
+import click
+from jinja2 import FileSystemBytecodeCache
+
+from compression import brotli
+from freeze import page_urls
+
+logger = logging.getLogger(__name__)
+
+# One request per representation, so every cached page's compressed variants exist too
+ACCEPT_ENCODINGS = ('identity', 'gzip') + (('br',) if brotli is not None else ())
+
+
+def init_app(app):
+    # Compiled templates persist in JINJA_CACHE_DIR, keyed by template name and source
+    # checksum, so a new worker loads bytecode instead of parsing and compiling.
+    # Must run before the first template is loaded.
+    cache_dir = app.config.get('JINJA_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    @app.cli.command('warmup')
+    def warmup_command():
+        """Compile every template into the bytecode cache and render every page once."""
+        stats = warm(app)
+        click.echo('Compiled {templates} templates in {compile_ms:.0f}ms, '
+                   'rendered {pages} pages in {render_ms:.0f}ms'.format(**stats))
+        if app.config.get('JINJA_CACHE_DIR'):
+            click.echo(f"Bytecode cache: {app.config['JINJA_CACHE_DIR']}")
+
+
+def compile_templates(app, jinja_env=None):
+    jinja_env = jinja_env or app.jinja_env
+    for name in jinja_env.list_templates():
+        jinja_env.get_template(name)
+
+
+def warm(app):
+    # Render every page so the first real request finds compiled templates, finished
+    # lazy imports and a filled page cache. `flask serve` runs this in the master before
+    # forking, so no worker ever takes a cold request.
+    started = time.perf_counter()
+    compile_templates(app)
+    compiled = time.perf_counter()
+
+    # Requests here must not start lead dispatcher threads in a process about to fork,
+    # nor spend the test client's render allowance
+    dispatch, app.config['LEADS_DISPATCH'] = app.config['LEADS_DISPATCH'], False
+    rate_limit, app.config['RATE_LIMIT'] = app.config['RATE_LIMIT'], False
+    pages = 0
+    try:
+        client = app.test_client()
+        for tenant in app.extensions['tenants']:
+            # Each tenant under its first host, so its own content and caches are filled
+            base_url = f'http://{tenant.hosts[0]}' if tenant.hosts else None
+            if tenant.jinja_env is not app.jinja_env:
+                compile_templates(app, tenant.jinja_env)
+            urls = page_urls(app, base_url)
+            for url in urls:
+                for encoding in ACCEPT_ENCODINGS:
+                    response = client.get(url, base_url=base_url, headers={'Accept-Encoding': encoding})
+                    response.close()
+                    if response.status_code != 200:
+                        logger.warning('Warm-up request for %s%s returned %s', base_url or '', url, response.status)
+            pages += len(urls)
+    finally:
+        app.config['LEADS_DISPATCH'] = dispatch
+        app.config['RATE_LIMIT'] = rate_limit
+    rendered = time.perf_counter()
+
+    # Warm-up traffic isn't real traffic
+    app.extensions['metrics'].reset()
+    for tenant in app.extensions['tenants']:
+        tenant.page_cache.hits = tenant.page_cache.misses = 0
+        tenant.fragment_cache.hits = tenant.fragment_cache.misses = 0
+
+    return {
+        'templates': len(app.jinja_env.list_templates()),
+        'compile_ms': (compiled - started) * 1000,
+        'pages': pages,
+        'render_ms': (rendered - compiled) * 1000,
+    }